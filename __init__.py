@@ -11,6 +11,7 @@ from . import expense_category
 from . import approval_rule
 from . import approval_request
 from . import currency_rate_cache
+from . import ocr_cache
 
 
 from . import models
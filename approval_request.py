@@ -1,7 +1,7 @@
 # type: ignore
 import logging
 from datetime import datetime, timedelta
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError, UserError
 
 _logger = logging.getLogger(__name__)
@@ -40,6 +40,7 @@ class ApprovalRequest(models.Model):
     sequence = fields.Integer(
         string='Sequence',
         default=1,
+        index=True,
         help='Order of approval in sequential workflows'
     )
     
@@ -51,7 +52,7 @@ class ApprovalRequest(models.Model):
         ('rejected', 'Rejected'),
         ('cancelled', 'Cancelled'),
         ('escalated', 'Escalated')
-    ], string='Status', default='waiting', required=True, tracking=True)
+    ], string='Status', default='waiting', required=True, tracking=True, index=True)
     
     # Request Information
     request_date = fields.Datetime(
@@ -170,6 +171,15 @@ class ApprovalRequest(models.Model):
         help='Whether current user can reject this request'
     )
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Claim workflow lookups filter by claim and state, ordered by sequence
+        tools.create_index(
+            self._cr, 'approval_request_claim_state_seq_idx', self._table,
+            ['expense_claim_id', 'state', 'sequence']
+        )
+        return res
+
     @api.depends('expense_claim_id', 'approver_id', 'required_amount')
     def _compute_display_name(self):
         for request in self:
@@ -498,9 +508,9 @@ class ApprovalRequest(models.Model):
     def _onchange_approver_id(self):
         if self.approver_id and self.state == 'waiting':
             # Auto-activate if this is the first approver
-            if not self.search([
+            if not self.search_count([
                 ('expense_claim_id', '=', self.expense_claim_id.id),
                 ('sequence', '<', self.sequence),
                 ('state', 'in', ['pending', 'approved'])
-            ]):
+            ], limit=1):
                 self.state = 'pending'
@@ -1,19 +1,75 @@
 # type: ignore
+import functools
 import logging
-import json
 import os
+import sys
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
-from odoo import models, api, _
+from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 _logger = logging.getLogger(__name__)
 
 
+def _read_env():
+    """Read API settings from the environment"""
+    use_stubs = os.getenv('USE_API_STUBS', 'False').lower() == 'true'
+    api_url = os.getenv('RESTCOUNTRIES_API_URL',
+                        'https://restcountries.com/v3.1/all?fields=name,currencies,cca2')
+    cache_ttl_days = int(os.getenv('COUNTRY_CACHE_TTL_DAYS', '7'))
+    return use_stubs, api_url, cache_ttl_days
+
+
+# Read once at import; call CountryService.reload_env() after changing them
+_USE_API_STUBS, _RESTCOUNTRIES_API_URL, _COUNTRY_CACHE_TTL_DAYS = _read_env()
+
+# Parsed country mappings keyed by (database, fetch date), shared by the
+# worker's threads
+_COUNTRY_CACHE = {}
+_COUNTRY_CACHE_LOCK = threading.Lock()
+
+# Pooled HTTP connections for RestCountries, retrying transient failures
+_HTTP = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+)
+_HTTP.mount('https://', _HTTP_ADAPTER)
+_HTTP.mount('http://', _HTTP_ADAPTER)
+
+
+def _json_dumps(obj):
+    """Serialize to a JSON string (orjson returns bytes)"""
+    data = _json.dumps(obj)
+    return data.decode() if isinstance(data, bytes) else data
+
+
+@functools.lru_cache(maxsize=8)
+def _load_fixture_json(path):
+    """Read and decode a JSON fixture file, once per process"""
+    with open(path, 'rb') as f:
+        return _json.loads(f.read())
+
+
 class CountryService(models.AbstractModel):
     _name = 'country.service'
     _description = 'Country and Currency Mapping Service'
 
+    @classmethod
+    def reload_env(cls):
+        """Re-read USE_API_STUBS, RESTCOUNTRIES_API_URL and COUNTRY_CACHE_TTL_DAYS from the environment"""
+        global _USE_API_STUBS, _RESTCOUNTRIES_API_URL, _COUNTRY_CACHE_TTL_DAYS
+        _USE_API_STUBS, _RESTCOUNTRIES_API_URL, _COUNTRY_CACHE_TTL_DAYS = _read_env()
+
     @api.model
     def get_country_currency(self, country_code):
         """
@@ -27,13 +83,16 @@ class CountryService(models.AbstractModel):
         """
         try:
             mappings = self._get_country_mappings()
+            code = (country_code or '').upper()
+            
+            country_name = self._get_iso2_index().get(code)
+            if country_name is None:
+                # No index for these mappings, resolve the name through res.country
+                country_name = self.env['res.country'].search([('code', '=', code)], limit=1).name
             
-            # Find country by code (case insensitive)
-            for country_name, currencies in mappings.items():
-                # Try to match by country code if we have it stored
-                # For now, we'll do a simple lookup by name
-                if currencies:
-                    return currencies[0]  # Return first currency
+            currencies = mappings.get(country_name)
+            if currencies:
+                return currencies[0]  # Return first currency
                     
         except Exception as e:
             _logger.error(f"Error getting currency for country {country_code}: {e}")
@@ -52,28 +111,39 @@ class CountryService(models.AbstractModel):
             dict: Country name to currency list mapping
         """
         cache_key = 'country_currency_mappings'
-        cache_ttl_days = int(os.getenv('COUNTRY_CACHE_TTL_DAYS', '7'))
+        cache_ttl_days = _COUNTRY_CACHE_TTL_DAYS
         
         # Check if we should use API stubs
-        use_stubs = os.getenv('USE_API_STUBS', 'False').lower() == 'true'
-        
-        if use_stubs:
+        if _USE_API_STUBS:
             _logger.info("Using API stubs for country mappings")
-            return self._load_fixture_mappings()
+            return self._load_fixture_countries()
+        
+        today_key = self._get_country_cache_key()
         
-        # Try to get from cache first
-        if not force_refresh:
+        # Try the in-process cache, then the stored cache
+        if force_refresh:
+            self._forget_mappings()
+        else:
+            with _COUNTRY_CACHE_LOCK:
+                cached = _COUNTRY_CACHE.get(today_key)
+            if cached is not None:
+                return cached['mappings']
+            
             cached_data = self._get_cached_mappings(cache_key, cache_ttl_days)
             if cached_data:
+                iso2_index = self._get_cached_iso2_index(cache_key)
+                self._remember_mappings(today_key, cached_data, iso2_index)
                 return cached_data
         
         # Fetch from API
         try:
-            mappings = self._fetch_country_mappings()
+            iso2_index = {}
+            mappings = self._fetch_country_mappings(iso2_index)
             
             if mappings:
                 # Cache the results
-                self._cache_mappings(cache_key, mappings)
+                self._cache_mappings(cache_key, mappings, iso2_index)
+                self._remember_mappings(today_key, mappings, iso2_index)
                 return mappings
             else:
                 _logger.warning("No mappings fetched from API, trying fallback")
@@ -84,48 +154,131 @@ class CountryService(models.AbstractModel):
         
         # Fallback to local fixture
         _logger.info("Using fallback country mappings")
-        return self._load_fixture_mappings()
+        return self._load_fixture_countries()
+
+    @api.model
+    def _get_country_cache_key(self):
+        """
+        Get the in-process cache key of today's mappings for this database
+        
+        Returns:
+            tuple: (database name, ISO date)
+        """
+        return (self.env.cr.dbname, fields.Date.context_today(self).isoformat())
+
+    @api.model
+    def _forget_mappings(self):
+        """Drop this database's entries from the in-process cache"""
+        dbname = self.env.cr.dbname
+        with _COUNTRY_CACHE_LOCK:
+            for key in [key for key in _COUNTRY_CACHE if key[0] == dbname]:
+                del _COUNTRY_CACHE[key]
+
+    @api.model
+    def _remember_mappings(self, cache_key, mappings, iso2_index=None):
+        """
+        Keep parsed mappings in the in-process cache, dropping older dates
+        
+        Args:
+            cache_key (tuple): (database name, ISO date) the mappings were fetched on
+            mappings (dict): Country to currency mappings
+            iso2_index (dict, optional): ISO2 code to country name index
+        """
+        self._forget_mappings()
+        with _COUNTRY_CACHE_LOCK:
+            _COUNTRY_CACHE[cache_key] = {
+                'mappings': mappings,
+                'iso2': iso2_index or {},
+            }
+
+    @api.model
+    def _get_iso2_index(self):
+        """
+        Get the ISO2 code to country name index of the current mappings
+        
+        Returns:
+            dict: ISO2 code to country name, empty when not available
+        """
+        with _COUNTRY_CACHE_LOCK:
+            cached = _COUNTRY_CACHE.get(self._get_country_cache_key())
+        if cached and cached['iso2']:
+            return cached['iso2']
+        
+        # Stub and fallback mappings come from the fixture, index it the same way
+        iso2_index = {}
+        self._load_fixture_countries(iso2_index)
+        return iso2_index
 
     @api.model
-    def _fetch_country_mappings(self):
+    def _parse_countries_data(self, countries_data, iso2_index=None):
+        """
+        Parse RestCountries-style data into country to currency mappings
+        
+        Args:
+            countries_data (list): Country entries with name, currencies and cca2
+            iso2_index (dict, optional): Filled with ISO2 code to country name
+            
+        Returns:
+            dict: Country name to currency list mapping
+        """
+        mappings = {}
+        
+        for country in countries_data:
+            self._accumulate_country(country, mappings, iso2_index)
+        
+        return mappings
+
+    @api.model
+    def _accumulate_country(self, country, mappings, iso2_index=None):
+        """
+        Add one RestCountries-style entry to the mappings being built
+        
+        Args:
+            country (dict): Country entry with name, currencies and cca2
+            mappings (dict): Country name to currency list mapping to fill
+            iso2_index (dict, optional): ISO2 code to country name index to fill
+        """
+        try:
+            country_name = country.get('name', {}).get('common', '')
+            currencies = country.get('currencies', {})
+            
+            if country_name and currencies:
+                # Each country gets its own entries; ISO 4217 codes are a small
+                # fixed set, so interning them is bounded
+                mappings[country_name] = [{
+                    'code': sys.intern(currency_code),
+                    'name': currency_info.get('name', ''),
+                    'symbol': currency_info.get('symbol', '')
+                } for currency_code, currency_info in currencies.items()]
+                
+                iso2 = country.get('cca2')
+                if iso2 and iso2_index is not None:
+                    iso2_index[sys.intern(iso2.upper())] = country_name
+                
+        except Exception as e:
+            _logger.warning(f"Error parsing country data: {e}")
+
+    @api.model
+    def _fetch_country_mappings(self, iso2_index=None):
         """
         Fetch country mappings from REST Countries API
         
+        Args:
+            iso2_index (dict, optional): Filled with ISO2 code to country name
+        
         Returns:
             dict: Parsed country to currency mappings
         """
-        api_url = os.getenv('RESTCOUNTRIES_API_URL', 
-                           'https://restcountries.com/v3.1/all?fields=name,currencies')
+        api_url = _RESTCOUNTRIES_API_URL
         
         _logger.info(f"Fetching country mappings from {api_url}")
         
         try:
-            response = requests.get(api_url, timeout=10)
+            response = _HTTP.get(api_url, timeout=10)
             response.raise_for_status()
             
             countries_data = response.json()
-            mappings = {}
-            
-            for country in countries_data:
-                try:
-                    country_name = country.get('name', {}).get('common', '')
-                    currencies = country.get('currencies', {})
-                    
-                    if country_name and currencies:
-                        currency_list = []
-                        
-                        for currency_code, currency_info in currencies.items():
-                            currency_list.append({
-                                'code': currency_code,
-                                'name': currency_info.get('name', ''),
-                                'symbol': currency_info.get('symbol', '')
-                            })
-                        
-                        mappings[country_name] = currency_list
-                        
-                except Exception as e:
-                    _logger.warning(f"Error parsing country data: {e}")
-                    continue
+            mappings = self._parse_countries_data(countries_data, iso2_index)
             
             _logger.info(f"Successfully parsed {len(mappings)} country mappings")
             return mappings
@@ -133,7 +286,7 @@ class CountryService(models.AbstractModel):
         except requests.exceptions.RequestException as e:
             _logger.error(f"Network error fetching country mappings: {e}")
             raise
-        except (json.JSONDecodeError, ValueError) as e:
+        except (_json.JSONDecodeError, ValueError) as e:
             _logger.error(f"Error parsing country mappings JSON: {e}")
             raise
         except Exception as e:
@@ -141,10 +294,13 @@ class CountryService(models.AbstractModel):
             raise
 
     @api.model
-    def _load_fixture_mappings(self):
+    def _load_fixture_countries(self, iso2_index=None):
         """
         Load country mappings from local fixture file
         
+        Args:
+            iso2_index (dict, optional): Filled with ISO2 code to country name
+        
         Returns:
             dict: Country to currency mappings from fixture
         """
@@ -152,31 +308,11 @@ class CountryService(models.AbstractModel):
             fixture_path = self._get_fixture_path('mock_restcountries.json')
             
             if os.path.exists(fixture_path):
-                with open(fixture_path, 'r', encoding='utf-8') as f:
-                    fixture_data = json.load(f)
+                # Decoded once per process; parsing builds fresh mappings per call
+                fixture_data = _load_fixture_json(fixture_path)
                 
                 # Parse fixture data in same format as API
-                mappings = {}
-                for country in fixture_data:
-                    try:
-                        country_name = country.get('name', {}).get('common', '')
-                        currencies = country.get('currencies', {})
-                        
-                        if country_name and currencies:
-                            currency_list = []
-                            
-                            for currency_code, currency_info in currencies.items():
-                                currency_list.append({
-                                    'code': currency_code,
-                                    'name': currency_info.get('name', ''),
-                                    'symbol': currency_info.get('symbol', '')
-                                })
-                            
-                            mappings[country_name] = currency_list
-                            
-                    except Exception as e:
-                        _logger.warning(f"Error parsing fixture country data: {e}")
-                        continue
+                mappings = self._parse_countries_data(fixture_data, iso2_index)
                 
                 _logger.info(f"Loaded {len(mappings)} country mappings from fixture")
                 return mappings
@@ -234,7 +370,7 @@ class CountryService(models.AbstractModel):
                 expiry_time = cache_time + timedelta(days=ttl_days)
                 
                 if datetime.now() < expiry_time:
-                    mappings = json.loads(cached_json)
+                    mappings = _json.loads(cached_json)
                     _logger.debug(f"Using cached country mappings (age: {datetime.now() - cache_time})")
                     return mappings
                 else:
@@ -246,19 +382,41 @@ class CountryService(models.AbstractModel):
         return None
 
     @api.model
-    def _cache_mappings(self, cache_key, mappings):
+    def _get_cached_iso2_index(self, cache_key):
+        """
+        Get the cached ISO2 code to country name index
+        
+        Args:
+            cache_key (str): Cache key
+            
+        Returns:
+            dict: Cached index or None
+        """
+        try:
+            cached_json = self.env['ir.config_parameter'].sudo().get_param(f'{cache_key}_iso2')
+            if cached_json:
+                return _json.loads(cached_json)
+        except Exception as e:
+            _logger.warning(f"Error reading cached ISO2 index: {e}")
+            
+        return None
+
+    @api.model
+    def _cache_mappings(self, cache_key, mappings, iso2_index=None):
         """
         Cache mappings with timestamp
         
         Args:
             cache_key (str): Cache key
             mappings (dict): Mappings to cache
+            iso2_index (dict, optional): ISO2 code to country name index
         """
         try:
             config_param = self.env['ir.config_parameter'].sudo()
             
             # Store data and timestamp
-            config_param.set_param(f'{cache_key}_data', json.dumps(mappings))
+            config_param.set_param(f'{cache_key}_data', _json_dumps(mappings))
+            config_param.set_param(f'{cache_key}_iso2', _json_dumps(iso2_index or {}))
             config_param.set_param(f'{cache_key}_timestamp', datetime.now().isoformat())
             
             _logger.debug(f"Cached {len(mappings)} country mappings")
@@ -4,9 +4,20 @@ from datetime import datetime, timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 _logger = logging.getLogger(__name__)
 
 
+def _json_dumps(obj):
+    """Serialize to a JSON string (orjson returns bytes)"""
+    data = _json.dumps(obj)
+    return data.decode() if isinstance(data, bytes) else data
+
+
 class CurrencyRateCache(models.Model):
     _name = 'currency.rate.cache'
     _description = 'Currency Exchange Rate Cache'
@@ -66,12 +77,14 @@ class CurrencyRateCache(models.Model):
         string='Expires At',
         compute='_compute_expires_at',
         store=True,
+        index=True,
         help='When this cache entry expires'
     )
     
     is_expired = fields.Boolean(
         string='Is Expired',
         compute='_compute_is_expired',
+        search='_search_is_expired',
         help='Whether this cache entry has expired'
     )
     
@@ -99,7 +112,17 @@ class CurrencyRateCache(models.Model):
         """Check if cache entry has expired"""
         now = fields.Datetime.now()
         for record in self:
-            record.is_expired = record.expires_at and record.expires_at < now
+            record.is_expired = bool(record.expires_at) and record.expires_at < now
+
+    def _search_is_expired(self, operator, value):
+        # Not stored, so compare the indexed expiration timestamp instead
+        if operator not in ('=', '!='):
+            raise ValidationError(_('Unsupported search on expired cache entries.'))
+        expired = bool(value) == (operator == '=')
+        now = fields.Datetime.now()
+        if expired:
+            return [('expires_at', '<', now)]
+        return ['|', ('expires_at', '=', False), ('expires_at', '>=', now)]
 
     @api.depends('base_currency', 'rate_date', 'is_fallback')
     def _compute_display_name(self):
@@ -162,8 +185,7 @@ class CurrencyRateCache(models.Model):
         
         if cache_entry and cache_entry.rates_json:
             try:
-                import json
-                rates = json.loads(cache_entry.rates_json)
+                rates = _json.loads(cache_entry.rates_json)
                 _logger.debug(f"Retrieved cached rates for {base_currency} from {cache_entry.rate_date}")
                 return {
                     'rates': rates,
@@ -171,7 +193,7 @@ class CurrencyRateCache(models.Model):
                     'source': 'cache',
                     'is_fallback': cache_entry.is_fallback
                 }
-            except (json.JSONDecodeError, ValueError) as e:
+            except (_json.JSONDecodeError, ValueError) as e:
                 _logger.error(f"Failed to parse cached rates JSON: {e}")
                 
         return None
@@ -191,7 +213,6 @@ class CurrencyRateCache(models.Model):
         Returns:
             currency.rate.cache: Created cache record
         """
-        import json
         import os
         
         # Get TTL from environment or use default
@@ -210,7 +231,7 @@ class CurrencyRateCache(models.Model):
         cache_entry = self.create({
             'base_currency': base_currency.upper(),
             'rate_date': today,
-            'rates_json': json.dumps(rates_data),
+            'rates_json': _json_dumps(rates_data),
             'source_url': source_url,
             'raw_rates_hash': raw_hash,
             'is_fallback': is_fallback,
@@ -223,11 +244,16 @@ class CurrencyRateCache(models.Model):
     @api.model
     def cleanup_expired(self):
         """Remove expired cache entries"""
-        expired_entries = self.search([('is_expired', '=', True)])
-        count = len(expired_entries)
+        # Nothing refers to cache entries, so delete them in one statement
+        self.flush_model(['expires_at'])
+        self.env.cr.execute(
+            f"DELETE FROM {self._table} WHERE expires_at < %s",
+            (fields.Datetime.now(),)
+        )
+        count = self.env.cr.rowcount
         
-        if expired_entries:
-            expired_entries.unlink()
+        if count:
+            self.invalidate_model()
             _logger.info(f"Cleaned up {count} expired currency cache entries")
             
         return count
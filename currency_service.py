@@ -1,25 +1,102 @@
 # type: ignore
 import logging
-import json
+import functools
 import os
+import sys
 import hashlib
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 from odoo import models, api, fields, _
 from odoo.exceptions import UserError
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 _logger = logging.getLogger(__name__)
 
 
+def _read_env():
+    """Read API settings from the environment"""
+    use_stubs = os.getenv('USE_API_STUBS', 'False').lower() == 'true'
+    api_url = os.getenv('EXCHANGE_API_URL', 'https://api.exchangerate-api.com/v4/latest').rstrip('/')
+    return use_stubs, api_url
+
+
+# Read once at import; call CurrencyService.reload_env() after changing them
+_USE_API_STUBS, _EXCHANGE_API_URL = _read_env()
+
+# Pooled HTTP connections reused across rate fetches; retries stay in
+# _fetch_rates_with_retry, which knows how to back off on 429/5xx
+_HTTP = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+_HTTP.mount('https://', _HTTP_ADAPTER)
+_HTTP.mount('http://', _HTTP_ADAPTER)
+
+# Currency codes accepted in rate responses: active ISO 4217 codes plus the
+# provider-specific ones below
+_VALID_CODES = frozenset((
+    'AED', 'AFN', 'ALL', 'AMD', 'ANG', 'AOA', 'ARS', 'AUD', 'AWG', 'AZN', 'BAM', 'BBD',
+    'BDT', 'BGN', 'BHD', 'BIF', 'BMD', 'BND', 'BOB', 'BRL', 'BSD', 'BTN', 'BWP', 'BYN',
+    'BZD', 'CAD', 'CDF', 'CHF', 'CLP', 'CNY', 'COP', 'CRC', 'CUP', 'CVE', 'CZK', 'DJF',
+    'DKK', 'DOP', 'DZD', 'EGP', 'ERN', 'ETB', 'EUR', 'FJD', 'FKP', 'GBP', 'GEL', 'GHS',
+    'GIP', 'GMD', 'GNF', 'GTQ', 'GYD', 'HKD', 'HNL', 'HTG', 'HUF', 'IDR', 'ILS', 'INR',
+    'IQD', 'IRR', 'ISK', 'JMD', 'JOD', 'JPY', 'KES', 'KGS', 'KHR', 'KMF', 'KPW', 'KRW',
+    'KWD', 'KYD', 'KZT', 'LAK', 'LBP', 'LKR', 'LRD', 'LSL', 'LYD', 'MAD', 'MDL', 'MGA',
+    'MKD', 'MMK', 'MNT', 'MOP', 'MRU', 'MUR', 'MVR', 'MWK', 'MXN', 'MYR', 'MZN', 'NAD',
+    'NGN', 'NIO', 'NOK', 'NPR', 'NZD', 'OMR', 'PAB', 'PEN', 'PGK', 'PHP', 'PKR', 'PLN',
+    'PYG', 'QAR', 'RON', 'RSD', 'RUB', 'RWF', 'SAR', 'SBD', 'SCR', 'SDG', 'SEK', 'SGD',
+    'SHP', 'SLE', 'SLL', 'SOS', 'SRD', 'SSP', 'STN', 'SVC', 'SYP', 'SZL', 'THB', 'TJS',
+    'TMT', 'TND', 'TOP', 'TRY', 'TTD', 'TWD', 'TZS', 'UAH', 'UGX', 'USD', 'UYU', 'UZS',
+    'VES', 'VND', 'VUV', 'WST', 'XAF', 'XCD', 'XCG', 'XOF', 'XPF', 'YER', 'ZAR', 'ZMW',
+    'ZWL', 'ZWG',
+    # Codes outside ISO 4217 that rate providers also quote
+    'FOK', 'GGP', 'HRK', 'IMP', 'JEP', 'KID', 'TVD', 'VED', 'XDR',
+))
+
+
+@functools.lru_cache(maxsize=64)
+def _url_for(base):
+    """Exchange rate API URL for a base currency"""
+    return f"{_EXCHANGE_API_URL}/{base}"
+
+
+@functools.lru_cache(maxsize=64)
+def _fixture_filename_for(base):
+    """Fixture filename holding stub rates for a base currency"""
+    return f'mock_rates_{base}.json'
+
+
+@functools.lru_cache(maxsize=8)
+def _load_fixture_json(path):
+    """Read and decode a JSON fixture file, once per process"""
+    with open(path, 'rb') as f:
+        return _json.loads(f.read())
+
+
 class CurrencyService(models.AbstractModel):
     _name = 'currency.service'
     _description = 'Currency Exchange Rate Service with Caching and Fallbacks'
 
-    # Rate limiting: simple in-memory cache
+    # Rate limiting: per-currency ring buffers of the last request timestamps
+    # (time.monotonic), shared by all threads of the worker process and only
+    # touched under the lock
     _rate_limit_cache = {}
+    _rate_limit_lock = threading.RLock()
     _max_requests_per_minute = 30
 
+    @classmethod
+    def reload_env(cls):
+        """Re-read USE_API_STUBS and EXCHANGE_API_URL from the environment"""
+        global _USE_API_STUBS, _EXCHANGE_API_URL
+        _USE_API_STUBS, _EXCHANGE_API_URL = _read_env()
+        _url_for.cache_clear()
+
     @api.model
     def get_exchange_rates(self, base_currency, target_date=None, force_refresh=False):
         """
@@ -33,21 +110,21 @@ class CurrencyService(models.AbstractModel):
         Returns:
             dict: Exchange rates data with metadata
         """
-        base_currency = base_currency.upper()
+        # Normalize once; private helpers expect uppercase codes, and the
+        # interned code is shared by the rate-limit buffers and cached rates
+        base_currency = sys.intern(base_currency.upper())
         
         if not target_date:
             target_date = fields.Date.today()
         
         # Check rate limiting
         if not self._check_rate_limit(base_currency):
-            _logger.warning(f"Rate limit exceeded for {base_currency}")
+            _logger.warning("Rate limit exceeded for %s", base_currency)
             return self._get_fallback_rates(base_currency, target_date)
         
         # Check if we should use API stubs
-        use_stubs = os.getenv('USE_API_STUBS', 'False').lower() == 'true'
-        
-        if use_stubs:
-            _logger.info(f"Using API stubs for currency rates: {base_currency}")
+        if _USE_API_STUBS:
+            _logger.info("Using API stubs for currency rates: %s", base_currency)
             return self._load_fixture_rates(base_currency)
         
         # Try cache first (unless force refresh)
@@ -65,10 +142,10 @@ class CurrencyService(models.AbstractModel):
                 self._store_rates_in_cache(base_currency, rates_data)
                 return rates_data
             else:
-                _logger.warning(f"No rates data received for {base_currency}")
+                _logger.warning("No rates data received for %s", base_currency)
                 
-        except Exception as e:
-            _logger.error(f"Failed to fetch rates for {base_currency}: {e}")
+        except Exception:
+            _logger.exception("Failed to fetch rates for %s", base_currency)
         
         # Fallback to cached or fixture data
         return self._get_fallback_rates(base_currency, target_date)
@@ -87,10 +164,11 @@ class CurrencyService(models.AbstractModel):
         Returns:
             dict: Conversion result with metadata
         """
+        # Normalize once; private helpers expect uppercase codes
         from_currency = from_currency.upper()
         to_currency = to_currency.upper()
         
-        # Same currency - no conversion needed
+        # Same currency - no conversion needed, nor any cache/API access
         if from_currency == to_currency:
             return {
                 'converted_amount': amount,
@@ -102,6 +180,22 @@ class CurrencyService(models.AbstractModel):
                 'metadata': {}
             }
         
+        # ISO 4217 codes are a small fixed set, so interning them is bounded
+        from_currency = sys.intern(from_currency)
+        to_currency = sys.intern(to_currency)
+        
+        # Zero amount - converts to zero at any rate, skip the rate lookup
+        if not amount:
+            return {
+                'converted_amount': 0.0,
+                'exchange_rate': 1.0,
+                'from_currency': from_currency,
+                'to_currency': to_currency,
+                'conversion_date': rate_date or fields.Date.today(),
+                'source': 'zero_amount',
+                'metadata': {}
+            }
+        
         try:
             # Get exchange rates for the base currency
             rates_data = self.get_exchange_rates(from_currency, rate_date)
@@ -142,11 +236,62 @@ class CurrencyService(models.AbstractModel):
         except UserError:
             raise
         except Exception as e:
-            _logger.error(f"Currency conversion error: {e}")
+            _logger.exception("Currency conversion error")
             raise UserError(
                 _('Currency conversion failed: %s. Please contact administrator.') % str(e)
             )
 
+    @api.model
+    def convert_amounts_bulk(self, pairs):
+        """
+        Get conversion rates for many currency pairs at once
+        
+        Rates are looked up once per (source currency, date), so converting
+        many amounts that share currencies and dates costs one lookup per group.
+        
+        Args:
+            pairs (iterable): (from_currency, to_currency, rate_date) tuples
+            
+        Returns:
+            dict: Maps each convertible pair to its 'exchange_rate',
+                'conversion_date' and 'source'. Pairs without a rate are omitted.
+        """
+        results = {}
+        rates_by_base = {}
+        
+        for key in set(pairs):
+            from_currency, to_currency, rate_date = key
+            from_currency = sys.intern(from_currency.upper())
+            to_currency = sys.intern(to_currency.upper())
+            
+            if from_currency == to_currency:
+                results[key] = {
+                    'exchange_rate': 1.0,
+                    'conversion_date': rate_date or fields.Date.today(),
+                    'source': 'no_conversion',
+                }
+                continue
+            
+            base_key = (from_currency, rate_date)
+            if base_key not in rates_by_base:
+                try:
+                    rates_by_base[base_key] = self.get_exchange_rates(from_currency, rate_date)
+                except Exception:
+                    _logger.exception("Failed to get rates for %s", from_currency)
+                    rates_by_base[base_key] = None
+            
+            rates_data = rates_by_base[base_key]
+            if not rates_data or to_currency not in rates_data.get('rates', {}):
+                continue
+            
+            results[key] = {
+                'exchange_rate': rates_data['rates'][to_currency],
+                'conversion_date': rates_data.get('date', rate_date or fields.Date.today()),
+                'source': rates_data.get('source', 'api'),
+            }
+        
+        return results
+
     @api.model
     def _fetch_rates_with_retry(self, base_currency, max_retries=3):
         """
@@ -159,20 +304,19 @@ class CurrencyService(models.AbstractModel):
         Returns:
             dict: Rates data or None
         """
-        api_url = os.getenv('EXCHANGE_API_URL', 'https://api.exchangerate-api.com/v4/latest')
-        url = f"{api_url}/{base_currency}"
+        url = _url_for(base_currency)
         
         for attempt in range(max_retries + 1):
             try:
-                _logger.debug(f"Fetching rates for {base_currency} (attempt {attempt + 1})")
+                _logger.debug("Fetching rates for %s (attempt %d)", base_currency, attempt + 1)
                 
-                response = requests.get(url, timeout=10)
+                response = _HTTP.get(url, timeout=10)
                 
                 # Handle rate limiting (429)
                 if response.status_code == 429:
                     if attempt < max_retries:
                         wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s
-                        _logger.warning(f"Rate limited (429), waiting {wait_time}s before retry")
+                        _logger.warning("Rate limited (429), waiting %ss before retry", wait_time)
                         time.sleep(wait_time)
                         continue
                     else:
@@ -183,11 +327,11 @@ class CurrencyService(models.AbstractModel):
                 if 500 <= response.status_code < 600:
                     if attempt < max_retries:
                         wait_time = 2 ** attempt
-                        _logger.warning(f"Server error ({response.status_code}), waiting {wait_time}s before retry")
+                        _logger.warning("Server error (%s), waiting %ss before retry", response.status_code, wait_time)
                         time.sleep(wait_time)
                         continue
                     else:
-                        _logger.error(f"Server error {response.status_code}, no more retries")
+                        _logger.error("Server error %s, no more retries", response.status_code)
                         return None
                 
                 response.raise_for_status()
@@ -205,7 +349,7 @@ class CurrencyService(models.AbstractModel):
                         'source': 'api'
                     })
                     
-                    _logger.info(f"Successfully fetched rates for {base_currency}")
+                    _logger.info("Successfully fetched rates for %s", base_currency)
                     return validated_data
                 else:
                     _logger.error("Invalid response format from API")
@@ -214,19 +358,19 @@ class CurrencyService(models.AbstractModel):
             except requests.exceptions.RequestException as e:
                 if attempt < max_retries:
                     wait_time = 2 ** attempt
-                    _logger.warning(f"Network error: {e}, waiting {wait_time}s before retry")
+                    _logger.warning("Network error: %s, waiting %ss before retry", e, wait_time)
                     time.sleep(wait_time)
                     continue
                 else:
-                    _logger.error(f"Network error after {max_retries} retries: {e}")
+                    _logger.exception("Network error after %d retries", max_retries)
                     return None
                     
-            except (json.JSONDecodeError, ValueError) as e:
-                _logger.error(f"JSON parsing error: {e}")
+            except (_json.JSONDecodeError, ValueError):
+                _logger.exception("JSON parsing error")
                 return None
                 
-            except Exception as e:
-                _logger.error(f"Unexpected error fetching rates: {e}")
+            except Exception:
+                _logger.exception("Unexpected error fetching rates")
                 return None
         
         return None
@@ -260,34 +404,35 @@ class CurrencyService(models.AbstractModel):
             
             # Validate base currency
             base = data.get('base', '').upper()
-            if base != expected_base.upper():
-                _logger.warning(f"Base currency mismatch: expected {expected_base}, got {base}")
-            
-            # Validate rate values
-            validated_rates = {}
-            for currency, rate in rates.items():
-                if not isinstance(currency, str) or len(currency) != 3:
-                    _logger.warning(f"Invalid currency code: {currency}")
-                    continue
-                
-                if not isinstance(rate, (int, float)) or rate <= 0:
-                    _logger.warning(f"Invalid rate for {currency}: {rate}")
-                    continue
-                
-                validated_rates[currency.upper()] = float(rate)
+            if base != expected_base:
+                _logger.warning("Base currency mismatch: expected %s, got %s", expected_base, base)
+            
+            # Validate rate values; exact type checks are cheaper than isinstance
+            # on large responses and keep bools out
+            validated_rates = {
+                sys.intern(code): float(rate)
+                for currency, rate in rates.items()
+                if type(currency) is str and (code := currency.upper()) in _VALID_CODES
+                and (type(rate) is float or type(rate) is int) and rate > 0
+            }
+            
+            if len(validated_rates) < len(rates):
+                _logger.warning(
+                    "Dropped %d invalid rates from %s response", len(rates) - len(validated_rates), expected_base
+                )
             
             if not validated_rates:
                 _logger.error("No valid rates found in response")
                 return None
             
             return {
-                'base': expected_base.upper(),
+                'base': expected_base,
                 'date': data.get('date', fields.Date.today().isoformat()),
                 'rates': validated_rates
             }
             
-        except Exception as e:
-            _logger.error(f"Error validating rates response: {e}")
+        except Exception:
+            _logger.exception("Error validating rates response")
             return None
 
     @api.model
@@ -307,11 +452,11 @@ class CurrencyService(models.AbstractModel):
             cached_data = cache_model.get_cached_rates(base_currency, target_date)
             
             if cached_data:
-                _logger.debug(f"Using cached rates for {base_currency}")
+                _logger.debug("Using cached rates for %s", base_currency)
                 return cached_data
                 
-        except Exception as e:
-            _logger.error(f"Error getting cached rates: {e}")
+        except Exception:
+            _logger.exception("Error getting cached rates")
             
         return None
 
@@ -334,8 +479,8 @@ class CurrencyService(models.AbstractModel):
                 is_fallback=False
             )
             
-        except Exception as e:
-            _logger.error(f"Error storing rates in cache: {e}")
+        except Exception:
+            _logger.exception("Error storing rates in cache")
 
     @api.model
     def _get_fallback_rates(self, base_currency, target_date):
@@ -349,18 +494,20 @@ class CurrencyService(models.AbstractModel):
         Returns:
             dict: Fallback rates or None
         """
+        assert base_currency.isupper(), base_currency
+        
         # Try most recent cached rates first
         try:
             cache_model = self.env['currency.rate.cache']
             
             # Get most recent entry (even if expired)
             recent_entry = cache_model.search([
-                ('base_currency', '=', base_currency.upper())
+                ('base_currency', '=', base_currency)
             ], order='rate_date desc', limit=1)
             
             if recent_entry and recent_entry.rates_json:
-                rates = json.loads(recent_entry.rates_json)
-                _logger.info(f"Using recent cached rates for {base_currency} from {recent_entry.rate_date}")
+                rates = _json.loads(recent_entry.rates_json)
+                _logger.info("Using recent cached rates for %s from %s", base_currency, recent_entry.rate_date)
                 
                 return {
                     'rates': rates,
@@ -373,8 +520,8 @@ class CurrencyService(models.AbstractModel):
                     }
                 }
                 
-        except Exception as e:
-            _logger.error(f"Error getting fallback cached rates: {e}")
+        except Exception:
+            _logger.exception("Error getting fallback cached rates")
         
         # Try fixture data
         fixture_rates = self._load_fixture_rates(base_currency)
@@ -382,7 +529,7 @@ class CurrencyService(models.AbstractModel):
             return fixture_rates
         
         # Last resort: mark as conversion pending
-        _logger.error(f"No fallback rates available for {base_currency}")
+        _logger.error("No fallback rates available for %s", base_currency)
         return None
 
     @api.model
@@ -396,13 +543,14 @@ class CurrencyService(models.AbstractModel):
         Returns:
             dict: Fixture rates or None
         """
+        assert base_currency.isupper(), base_currency
+        
         try:
-            fixture_filename = f'mock_rates_{base_currency.upper()}.json'
+            fixture_filename = _fixture_filename_for(base_currency)
             fixture_path = self._get_fixture_path(fixture_filename)
             
             if os.path.exists(fixture_path):
-                with open(fixture_path, 'r', encoding='utf-8') as f:
-                    fixture_data = json.load(f)
+                fixture_data = _load_fixture_json(fixture_path)
                 
                 validated_data = self._validate_rates_response(fixture_data, base_currency)
                 
@@ -416,13 +564,13 @@ class CurrencyService(models.AbstractModel):
                         }
                     })
                     
-                    _logger.info(f"Loaded fixture rates for {base_currency}")
+                    _logger.info("Loaded fixture rates for %s", base_currency)
                     return validated_data
             else:
-                _logger.warning(f"Fixture file not found: {fixture_path}")
+                _logger.warning("Fixture file not found: %s", fixture_path)
                 
-        except Exception as e:
-            _logger.error(f"Error loading fixture rates: {e}")
+        except Exception:
+            _logger.exception("Error loading fixture rates")
         
         # Return minimal fallback rates
         return self._get_minimal_fallback_rates(base_currency)
@@ -446,12 +594,12 @@ class CurrencyService(models.AbstractModel):
             'INR': {'USD': 0.012, 'EUR': 0.010, 'GBP': 0.009, 'JPY': 1.33, 'CAD': 0.015, 'AUD': 0.016},
         }
         
-        base_rates = fallback_rates.get(base_currency.upper(), {})
+        base_rates = fallback_rates.get(base_currency, {})
         
         if base_rates:
-            _logger.warning(f"Using minimal fallback rates for {base_currency}")
+            _logger.warning("Using minimal fallback rates for %s", base_currency)
             return {
-                'base': base_currency.upper(),
+                'base': base_currency,
                 'date': fields.Date.today().isoformat(),
                 'rates': base_rates,
                 'source': 'minimal_fallback',
@@ -481,31 +629,22 @@ class CurrencyService(models.AbstractModel):
         Returns:
             bool: True if request is allowed
         """
-        now = time.time()
-        minute_ago = now - 60
-        
-        # Clean old entries
-        self._rate_limit_cache = {
-            key: timestamps for key, timestamps in self._rate_limit_cache.items()
-            if any(ts > minute_ago for ts in timestamps)
-        }
-        
-        # Check current currency
-        if base_currency not in self._rate_limit_cache:
-            self._rate_limit_cache[base_currency] = []
-        
-        # Remove old timestamps for this currency
-        self._rate_limit_cache[base_currency] = [
-            ts for ts in self._rate_limit_cache[base_currency] if ts > minute_ago
-        ]
-        
-        # Check if limit exceeded
-        if len(self._rate_limit_cache[base_currency]) >= self._max_requests_per_minute:
-            return False
-        
-        # Add current request
-        self._rate_limit_cache[base_currency].append(now)
-        return True
+        now = time.monotonic()
+        limit = self._max_requests_per_minute
+        
+        with self._rate_limit_lock:
+            # Only the last `limit` requests matter, older ones fall off the buffer
+            timestamps = self._rate_limit_cache.get(base_currency)
+            if timestamps is None:
+                timestamps = self._rate_limit_cache[base_currency] = deque(maxlen=limit)
+            
+            # Limit exceeded if the oldest kept request is within the last minute
+            if len(timestamps) >= limit and now - timestamps[0] < 60:
+                return False
+            
+            # Add current request
+            timestamps.append(now)
+            return True
 
     @api.model
     def get_cache_statistics(self):
@@ -519,7 +658,7 @@ class CurrencyService(models.AbstractModel):
             cache_model = self.env['currency.rate.cache']
             return cache_model.get_cache_stats()
         except Exception as e:
-            _logger.error(f"Error getting cache statistics: {e}")
+            _logger.exception("Error getting cache statistics")
             return {'error': str(e)}
 
     @api.model
@@ -533,6 +672,6 @@ class CurrencyService(models.AbstractModel):
         try:
             cache_model = self.env['currency.rate.cache']
             return cache_model.cleanup_expired()
-        except Exception as e:
-            _logger.error(f"Error cleaning up cache: {e}")
+        except Exception:
+            _logger.exception("Error cleaning up cache")
             return 0
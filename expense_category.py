@@ -11,12 +11,14 @@ class ExpenseCategory(models.Model):
     name = fields.Char(
         string='Category Name',
         required=True,
-        translate=True
+        translate=True,
+        index='trigram'
     )
     code = fields.Char(
         string='Code',
         required=True,
-        size=10
+        size=10,
+        index=True
     )
     sequence = fields.Integer(
         string='Sequence',
@@ -50,26 +52,30 @@ class ExpenseCategory(models.Model):
         string='Company',
         default=lambda self: self.env.company
     )
+    display_name = fields.Char(
+        string='Display Name',
+        compute='_compute_display_name'
+    )
 
     _sql_constraints = [
         ('code_unique', 'UNIQUE(code, company_id)', 'Category code must be unique per company!'),
     ]
 
     @api.depends('name', 'code')
-    def name_get(self):
-        result = []
+    @api.depends_context('lang')
+    def _compute_display_name(self):
         for category in self:
-            name = f"[{category.code}] {category.name}"
-            result.append((category.id, name))
-        return result
+            category.display_name = f"[{category.code}] {category.name}"
 
     @api.model
     def name_search(self, name='', args=None, operator='ilike', limit=100):
         args = args or []
         if name:
-            categories = self.search([
+            # Fetch name and code with the search query itself, through the
+            # trigram/btree indexes, and build the label from them
+            categories = self.search_fetch([
                 '|', ('name', operator, name),
                 ('code', operator, name)
-            ] + args, limit=limit)
-            return categories.name_get()
+            ] + args, ['name', 'code'], limit=limit)
+            return [(category.id, category.display_name) for category in categories]
         return super().name_search(name, args, operator, limit)
@@ -1,8 +1,10 @@
 # type: ignore
 import logging
+from collections import defaultdict
 from datetime import datetime
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
 
 _logger = logging.getLogger(__name__)
 
@@ -156,7 +158,7 @@ class ExpenseClaim(models.Model):
         'hr.employee',
         string='Current Approver',
         compute='_compute_current_approver',
-        store=True
+        search='_search_current_approver'
     )
     
     approval_level = fields.Integer(
@@ -182,88 +184,205 @@ class ExpenseClaim(models.Model):
     )
     
     # Computed Fields
-    @api.depends('name', 'employee_id', 'total_amount', 'currency_id')
+    @api.depends('name', 'employee_id.name')
     def _compute_display_name(self):
+        # Prefetch employee names for the whole recordset in one query
+        self.mapped('employee_id.name')
+        new_label = _('New')
         for claim in self:
-            if claim.name and claim.name != _('New'):
-                claim.display_name = f"{claim.name} - {claim.employee_id.name or ''}"
+            name = claim.name
+            employee_name = claim.employee_id.name or ''
+            if name and name != new_label:
+                claim.display_name = '%s - %s' % (name, employee_name)
             else:
-                claim.display_name = f"Draft Claim - {claim.employee_id.name or ''}"
+                claim.display_name = 'Draft Claim - %s' % employee_name
 
     @api.depends('expense_line_ids.total_amount')
     def _compute_total_amount(self):
+        # Sum saved claims' lines in SQL; unsaved (onchange) claims only
+        # exist in cache and are summed in Python
+        saved_claims = self.filtered(lambda c: isinstance(c.id, int))
+        totals = {}
+        if saved_claims:
+            groups = self.env['expense.line'].read_group(
+                [('claim_id', 'in', saved_claims.ids)],
+                ['claim_id', 'total_amount:sum'],
+                ['claim_id']
+            )
+            totals = {group['claim_id'][0]: group['total_amount'] for group in groups}
+        
         for claim in self:
-            claim.total_amount = sum(claim.expense_line_ids.mapped('total_amount'))
+            if isinstance(claim.id, int):
+                claim.total_amount = totals.get(claim.id, 0.0)
+            else:
+                claim.total_amount = sum(claim.expense_line_ids.mapped('total_amount'))
 
     @api.depends('expense_line_ids')
     def _compute_expense_line_count(self):
+        # Count saved claims' lines in SQL; unsaved (onchange) claims only
+        # exist in cache and are counted in Python
+        saved_claims = self.filtered(lambda c: isinstance(c.id, int))
+        counts = {}
+        if saved_claims:
+            groups = self.env['expense.line'].read_group(
+                [('claim_id', 'in', saved_claims.ids)],
+                ['claim_id'],
+                ['claim_id']
+            )
+            counts = {group['claim_id'][0]: group['claim_id_count'] for group in groups}
+        
         for claim in self:
-            claim.expense_line_count = len(claim.expense_line_ids)
+            if isinstance(claim.id, int):
+                claim.expense_line_count = counts.get(claim.id, 0)
+            else:
+                claim.expense_line_count = len(claim.expense_line_ids)
 
     @api.depends('total_amount_company_currency', 'company_id')
     def _compute_requires_cfo_approval(self):
+        # Read the threshold once per distinct company
+        cfo_thresholds = {
+            company.id: company.expense_cfo_approval_required
+            for company in self.mapped('company_id')
+        }
         for claim in self:
-            cfo_threshold = claim.company_id.expense_cfo_approval_required
+            cfo_threshold = cfo_thresholds.get(claim.company_id.id, 0.0)
             claim.requires_cfo_approval = claim.total_amount_company_currency >= cfo_threshold
 
     @api.depends('approval_request_ids', 'state')
     def _compute_current_approver(self):
+        # Group pending requests per claim in a single pass over all requests
+        pending_by_claim = defaultdict(list)
+        for request in self.approval_request_ids:
+            if request.state == 'pending':
+                pending_by_claim[request.expense_claim_id.id].append(
+                    (request.sequence, request.id, request.approver_id)
+                )
+        
         for claim in self:
-            if claim.state in ['submitted', 'under_review']:
-                pending_approval = claim.approval_request_ids.filtered(
-                    lambda r: r.state == 'pending'
-                ).sorted('sequence')
-                
-                claim.current_approver_id = pending_approval[0].approver_id if pending_approval else False
+            pending = pending_by_claim.get(claim.id)
+            if claim.state in ['submitted', 'under_review'] and pending:
+                claim.current_approver_id = min(pending, key=lambda p: p[:2])[2]
             else:
                 claim.current_approver_id = False
 
+    def _search_current_approver(self, operator, value):
+        review_states = ['submitted', 'under_review']
+        pending_domain = [('state', '=', 'pending')]
+        if operator in ('=', '!=') and not value:
+            if operator == '=':
+                # No current approver: not in review, or nothing pending
+                return [
+                    '|',
+                    ('state', 'not in', review_states),
+                    ('approval_request_ids', 'not any', pending_domain),
+                ]
+            return [
+                ('state', 'in', review_states),
+                ('approval_request_ids', 'any', pending_domain),
+            ]
+        
+        # Not stored: pick the first pending request per claim in review,
+        # the same one _compute_current_approver picks
+        requests = self.env['approval.request'].search_fetch([
+            ('state', '=', 'pending'),
+            ('expense_claim_id.state', 'in', review_states),
+        ], ['expense_claim_id', 'approver_id', 'sequence'], order='sequence, id')
+        current_approvers = {}
+        for request in requests:
+            current_approvers.setdefault(request.expense_claim_id.id, request.approver_id)
+        
+        # Negative operators also match claims without a current approver
+        negative = operator in expression.NEGATIVE_TERM_OPERATORS
+        if negative:
+            operator = expression.TERM_OPERATORS_NEGATION[operator]
+        
+        field_name = 'name' if isinstance(value, str) else 'id'
+        approvers = self.env['hr.employee'].union(*current_approvers.values())
+        matching = approvers.filtered_domain([(field_name, operator, value)])
+        claim_ids = [
+            claim_id for claim_id, approver in current_approvers.items()
+            if approver in matching
+        ]
+        return [('id', 'not in' if negative else 'in', claim_ids)]
+
     @api.depends('total_amount', 'currency_id', 'company_currency_id')
     def _compute_company_currency_amount(self):
-        for claim in self:
-            if claim.currency_id == claim.company_currency_id:
-                claim.total_amount_company_currency = claim.total_amount
-                claim.conversion_rate = 1.0
-            elif claim.total_amount and claim.currency_id and claim.company_currency_id:
-                # Convert using currency service
-                try:
-                    currency_service = self.env['currency.service']
-                    conversion_result = currency_service.convert_amount(
-                        amount=claim.total_amount,
-                        from_currency=claim.currency_id.name,
-                        to_currency=claim.company_currency_id.name,
-                        rate_date=claim.claim_date
-                    )
-                    
-                    claim.total_amount_company_currency = conversion_result['converted_amount']
-                    claim.conversion_rate = conversion_result['exchange_rate']
-                    claim.conversion_date = conversion_result['conversion_date']
-                    claim.conversion_pending = False
-                    
-                except Exception as e:
-                    _logger.error(f"Currency conversion failed for claim {claim.id}: {e}")
-                    claim.total_amount_company_currency = 0.0
-                    claim.conversion_rate = 0.0
-                    claim.conversion_pending = True
-            else:
+        # Common case first: claims already in company currency need no lookup
+        same_currency = self.filtered(lambda c: c.currency_id == c.company_currency_id)
+        for claim in same_currency:
+            claim.total_amount_company_currency = claim.total_amount
+            claim.conversion_rate = 1.0
+        
+        other = self - same_currency
+        to_convert = other.filtered(
+            lambda c: c.total_amount and c.currency_id and c.company_currency_id
+        )
+        for claim in other - to_convert:
+            claim.total_amount_company_currency = 0.0
+            claim.conversion_rate = 0.0
+        
+        if not to_convert:
+            return
+        
+        # Look up one rate per (currency, company currency, date) group
+        currency_service = self.env['currency.service']
+        try:
+            rates = currency_service.convert_amounts_bulk({
+                (claim.currency_id.name, claim.company_currency_id.name, claim.claim_date)
+                for claim in to_convert
+            })
+        except Exception as e:
+            _logger.error(f"Bulk currency conversion failed: {e}")
+            rates = {}
+        
+        for claim in to_convert:
+            key = (claim.currency_id.name, claim.company_currency_id.name, claim.claim_date)
+            rate = rates.get(key)
+            if rate:
+                claim.total_amount_company_currency = claim.total_amount * rate['exchange_rate']
+                claim.conversion_rate = rate['exchange_rate']
+                claim.conversion_date = rate['conversion_date']
+                claim.conversion_pending = False
+                continue
+            
+            # No bulk rate for this group - convert individually
+            try:
+                conversion_result = currency_service.convert_amount(
+                    amount=claim.total_amount,
+                    from_currency=claim.currency_id.name,
+                    to_currency=claim.company_currency_id.name,
+                    rate_date=claim.claim_date
+                )
+                
+                claim.total_amount_company_currency = conversion_result['converted_amount']
+                claim.conversion_rate = conversion_result['exchange_rate']
+                claim.conversion_date = conversion_result['conversion_date']
+                claim.conversion_pending = False
+                
+            except Exception as e:
+                _logger.error(f"Currency conversion failed for claim {claim.id}: {e}")
                 claim.total_amount_company_currency = 0.0
                 claim.conversion_rate = 0.0
+                claim.conversion_pending = True
 
     # CRUD Operations
-    @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('expense.claim') or _('New')
+    @api.model_create_multi
+    def create(self, vals_list):
+        sequence = self.env['ir.sequence']
+        new_label = _('New')
+        for vals in vals_list:
+            if vals.get('name', new_label) == new_label:
+                vals['name'] = sequence.next_by_code('expense.claim') or new_label
         
-        claim = super().create(vals)
+        claims = super().create(vals_list)
         
         # Log creation
-        claim.message_post(
-            body=_('Expense claim created by %s') % claim.employee_id.name,
-            message_type='notification'
-        )
+        claims._message_log_batch(bodies={
+            claim.id: _('Expense claim created by %s') % claim.employee_id.name
+            for claim in claims
+        })
         
-        return claim
+        return claims
 
     # Workflow Actions
     def action_submit(self):
@@ -280,36 +399,40 @@ class ExpenseClaim(models.Model):
                 raise UserError(
                     _('Currency conversion is pending. Please contact administrator or try again later.')
                 )
-            
-            # Update state and submission date
-            claim.write({
-                'state': 'submitted',
-                'submission_date': fields.Datetime.now()
-            })
-            
-            # Create approval requests
-            claim._create_approval_requests()
-            
-            # Log submission
-            claim.message_post(
-                body=_('Expense claim submitted for approval'),
-                message_type='notification'
-            )
+        
+        # Update state and submission date
+        self.write({
+            'state': 'submitted',
+            'submission_date': fields.Datetime.now()
+        })
+        
+        # Create approval requests
+        self._create_approval_requests()
+        
+        # Log submission
+        self._message_log_batch(
+            bodies={claim.id: _('Expense claim submitted for approval') for claim in self}
+        )
 
     def action_approve(self):
         """Approve current level of expense claim"""
+        current_user_employee = self.env.user.employee_id
+        if not current_user_employee:
+            raise UserError(_('You must be linked to an employee to approve expenses.'))
+        
+        fully_approved = self.env['expense.claim']
+        under_review = self.env['expense.claim']
+        
         for claim in self:
             if claim.state not in ['submitted', 'under_review']:
                 raise UserError(_('Only submitted or under review claims can be approved.'))
             
-            current_user_employee = self.env.user.employee_id
-            if not current_user_employee:
-                raise UserError(_('You must be linked to an employee to approve expenses.'))
-            
             # Find pending approval for current user
-            pending_approval = claim.approval_request_ids.filtered(
-                lambda r: r.approver_id == current_user_employee and r.state == 'pending'
-            )
+            pending_approval = self.env['approval.request'].search([
+                ('expense_claim_id', '=', claim.id),
+                ('approver_id', '=', current_user_employee.id),
+                ('state', '=', 'pending')
+            ], limit=1)
             
             if not pending_approval:
                 raise UserError(_('You are not authorized to approve this claim at this level.'))
@@ -318,149 +441,183 @@ class ExpenseClaim(models.Model):
             pending_approval.action_approve()
             
             # Check if all approvals are complete
-            if not claim.approval_request_ids.filtered(lambda r: r.state == 'pending'):
-                claim.write({'state': 'approved'})
-                claim.message_post(
-                    body=_('Expense claim fully approved'),
-                    message_type='notification'
-                )
+            if not self.env['approval.request'].search_count([
+                ('expense_claim_id', '=', claim.id),
+                ('state', '=', 'pending')
+            ]):
+                fully_approved |= claim
             else:
-                claim.write({'state': 'under_review'})
-                next_approver = claim.current_approver_id
-                if next_approver:
-                    claim.message_post(
-                        body=_('Expense claim approved at level %d. Next approver: %s') % 
-                             (claim.approval_level, next_approver.name),
-                        message_type='notification'
-                    )
+                under_review |= claim
+        
+        # One write per target state
+        fully_approved.write({'state': 'approved'})
+        under_review.write({'state': 'under_review'})
+        
+        bodies = {claim.id: _('Expense claim fully approved') for claim in fully_approved}
+        for claim in under_review:
+            next_approver = claim.current_approver_id
+            if next_approver:
+                bodies[claim.id] = _('Expense claim approved at level %d. Next approver: %s') % (
+                    claim.approval_level, next_approver.name
+                )
+        self.browse(list(bodies))._message_log_batch(bodies=bodies)
 
     def action_reject(self, reason=None):
         """Reject expense claim"""
+        current_user_employee = self.env.user.employee_id
+        if not current_user_employee:
+            raise UserError(_('You must be linked to an employee to reject expenses.'))
+        
         for claim in self:
             if claim.state not in ['submitted', 'under_review']:
                 raise UserError(_('Only submitted or under review claims can be rejected.'))
             
-            current_user_employee = self.env.user.employee_id
-            if not current_user_employee:
-                raise UserError(_('You must be linked to an employee to reject expenses.'))
-            
             # Find pending approval for current user
-            pending_approval = claim.approval_request_ids.filtered(
-                lambda r: r.approver_id == current_user_employee and r.state == 'pending'
-            )
+            pending_approval = self.env['approval.request'].search([
+                ('expense_claim_id', '=', claim.id),
+                ('approver_id', '=', current_user_employee.id),
+                ('state', '=', 'pending')
+            ], limit=1)
             
             if not pending_approval:
                 raise UserError(_('You are not authorized to reject this claim.'))
             
             # Reject the request
             pending_approval.action_reject(reason)
-            
-            # Update claim state
-            claim.write({
-                'state': 'rejected',
-                'rejection_reason': reason or _('No reason provided')
-            })
-            
-            claim.message_post(
-                body=_('Expense claim rejected by %s. Reason: %s') % 
-                     (current_user_employee.name, reason or _('No reason provided')),
-                message_type='notification'
-            )
+        
+        # Update claim state
+        self.write({
+            'state': 'rejected',
+            'rejection_reason': reason or _('No reason provided')
+        })
+        
+        body = _('Expense claim rejected by %s. Reason: %s') % (
+            current_user_employee.name, reason or _('No reason provided')
+        )
+        self._message_log_batch(bodies={claim.id: body for claim in self})
 
     def action_reset_to_draft(self):
         """Reset claim to draft state"""
-        for claim in self:
-            if claim.state not in ['rejected', 'cancelled']:
-                raise UserError(_('Only rejected or cancelled claims can be reset to draft.'))
-            
-            # Cancel all approval requests
-            claim.approval_request_ids.write({'state': 'cancelled'})
-            
-            claim.write({
-                'state': 'draft',
-                'submission_date': False,
-                'rejection_reason': False,
-                'approval_level': 0
-            })
-            
-            claim.message_post(
-                body=_('Expense claim reset to draft'),
-                message_type='notification'
-            )
+        if any(claim.state not in ['rejected', 'cancelled'] for claim in self):
+            raise UserError(_('Only rejected or cancelled claims can be reset to draft.'))
+        
+        # Cancel all approval requests
+        self.approval_request_ids.write({'state': 'cancelled'})
+        
+        self.write({
+            'state': 'draft',
+            'submission_date': False,
+            'rejection_reason': False,
+            'approval_level': 0
+        })
+        
+        self._message_log_batch(
+            bodies={claim.id: _('Expense claim reset to draft') for claim in self}
+        )
 
     def action_cancel(self):
         """Cancel expense claim"""
-        for claim in self:
-            if claim.state in ['paid']:
-                raise UserError(_('Paid claims cannot be cancelled.'))
-            
-            # Cancel all approval requests
-            claim.approval_request_ids.write({'state': 'cancelled'})
-            
-            claim.write({'state': 'cancelled'})
-            
-            claim.message_post(
-                body=_('Expense claim cancelled'),
-                message_type='notification'
-            )
+        if any(claim.state in ['paid'] for claim in self):
+            raise UserError(_('Paid claims cannot be cancelled.'))
+        
+        # Cancel all approval requests
+        self.approval_request_ids.write({'state': 'cancelled'})
+        
+        self.write({'state': 'cancelled'})
+        
+        self._message_log_batch(
+            bodies={claim.id: _('Expense claim cancelled') for claim in self}
+        )
 
     def action_mark_paid(self):
         """Mark claim as paid (for accounting integration)"""
-        for claim in self:
-            if claim.state != 'approved':
-                raise UserError(_('Only approved claims can be marked as paid.'))
-            
-            claim.write({'state': 'paid'})
-            
-            claim.message_post(
-                body=_('Expense claim marked as paid'),
-                message_type='notification'
-            )
+        if any(claim.state != 'approved' for claim in self):
+            raise UserError(_('Only approved claims can be marked as paid.'))
+        
+        self.write({'state': 'paid'})
+        
+        self._message_log_batch(
+            bodies={claim.id: _('Expense claim marked as paid') for claim in self}
+        )
 
     def _create_approval_requests(self):
         """Create approval requests based on company rules"""
+        # Prefetch related records used by rule matching in one query each
+        self.mapped('employee_id.parent_id')
+        self.mapped('employee_id.department_id')
+        # Read the auto-approve limit once per distinct company
+        auto_approve_limits = {
+            company.id: company.expense_auto_approve_limit
+            for company in self.mapped('company_id')
+        }
+        
+        # Collect requests for all claims so they are created, and their
+        # dependent computes invalidated, in a single batch
+        vals_list = []
+        requested_claims = self.env['expense.claim']
+        auto_approved_claims = self.env['expense.claim']
+        
+        # Claims submitted together often share rule lookup inputs
+        rules_cache = {}
+        approvers_cache = {}
+        
         for claim in self:
             # Get applicable approval rules
-            approval_rules = self.env['approval.rule'].get_applicable_rules(
-                amount=claim.total_amount_company_currency,
-                employee=claim.employee_id,
-                department=claim.department_id,
-                company=claim.company_id
+            rules_key = (
+                claim.company_id.id,
+                claim.department_id.id,
+                claim.employee_id.id,
+                round(claim.total_amount_company_currency, 2),
             )
+            if rules_key not in rules_cache:
+                rules_cache[rules_key] = self.env['approval.rule'].get_applicable_rules(
+                    amount=claim.total_amount_company_currency,
+                    employee=claim.employee_id,
+                    department=claim.department_id,
+                    company=claim.company_id
+                )
+            approval_rules = rules_cache[rules_key]
             
             if not approval_rules:
                 # Auto-approve if no rules apply and below auto-approve limit
-                auto_approve_limit = claim.company_id.expense_auto_approve_limit
+                auto_approve_limit = auto_approve_limits[claim.company_id.id]
                 if claim.total_amount_company_currency <= auto_approve_limit:
-                    claim.write({'state': 'approved'})
-                    claim.message_post(
-                        body=_('Expense claim auto-approved (below threshold)'),
-                        message_type='notification'
-                    )
-                    return
+                    auto_approved_claims |= claim
+                    continue
                 else:
                     raise UserError(
                         _('No approval rules found for this expense amount. Please contact administrator.')
                     )
             
-            # Create approval requests
-            sequence = 1
+            rule_approvers = []
             for rule in approval_rules:
-                approvers = rule.get_approvers(claim.employee_id, claim.department_id)
-                
-                for approver in approvers:
-                    self.env['approval.request'].create({
-                        'expense_claim_id': claim.id,
-                        'approval_rule_id': rule.id,
-                        'approver_id': approver.id,
-                        'sequence': sequence,
-                        'state': 'pending' if sequence == 1 else 'waiting',
-                        'required_amount': claim.total_amount_company_currency,
-                    })
-                    sequence += 1
-            
-            # Update approval level
-            claim.approval_level = 1
+                approvers_key = (rule.id, claim.employee_id.id, claim.department_id.id)
+                if approvers_key not in approvers_cache:
+                    approvers_cache[approvers_key] = rule.get_approvers(
+                        claim.employee_id, claim.department_id
+                    )
+                rule_approvers += [(rule, approver) for approver in approvers_cache[approvers_key]]
+            vals_list += [{
+                'expense_claim_id': claim.id,
+                'approval_rule_id': rule.id,
+                'approver_id': approver.id,
+                'sequence': sequence,
+                'state': 'pending' if sequence == 1 else 'waiting',
+                'required_amount': claim.total_amount_company_currency,
+            } for sequence, (rule, approver) in enumerate(rule_approvers, start=1)]
+            requested_claims |= claim
+        
+        self.env['approval.request'].create(vals_list)
+        
+        # Update approval level
+        requested_claims.write({'approval_level': 1})
+        
+        if auto_approved_claims:
+            auto_approved_claims.write({'state': 'approved'})
+            auto_approved_claims._message_log_batch(bodies={
+                claim.id: _('Expense claim auto-approved (below threshold)')
+                for claim in auto_approved_claims
+            })
 
     # Utility Methods
     def action_view_expense_lines(self):
@@ -489,35 +646,39 @@ class ExpenseClaim(models.Model):
 
     def action_refresh_currency_conversion(self):
         """Manually refresh currency conversion"""
-        for claim in self:
-            if claim.conversion_pending:
-                # Trigger recomputation
-                claim._compute_company_currency_amount()
-                
-                if not claim.conversion_pending:
-                    claim.message_post(
-                        body=_('Currency conversion refreshed successfully'),
-                        message_type='notification'
-                    )
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'title': _('Conversion Updated'),
-                            'message': _('Currency conversion refreshed successfully'),
-                            'type': 'success',
-                        }
-                    }
-                else:
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'title': _('Conversion Failed'),
-                            'message': _('Currency conversion still pending. Please try again later.'),
-                            'type': 'warning',
-                        }
-                    }
+        pending = self.filtered('conversion_pending')
+        if not pending:
+            return
+        
+        # Trigger recomputation once for all pending claims
+        pending._compute_company_currency_amount()
+        
+        for claim in pending.filtered(lambda c: not c.conversion_pending):
+            claim.message_post(
+                body=_('Currency conversion refreshed successfully'),
+                message_type='notification'
+            )
+        
+        if not any(pending.mapped('conversion_pending')):
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Conversion Updated'),
+                    'message': _('Currency conversion refreshed successfully'),
+                    'type': 'success',
+                }
+            }
+        else:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Conversion Failed'),
+                    'message': _('Currency conversion still pending. Please try again later.'),
+                    'type': 'warning',
+                }
+            }
 
     # Demo/Testing Methods
     def action_demo_approve_all(self):
@@ -525,25 +686,24 @@ class ExpenseClaim(models.Model):
         if not self.env.context.get('demo_mode'):
             raise UserError(_('This action is only available in demo mode.'))
         
-        for claim in self:
-            if claim.state in ['submitted', 'under_review']:
-                # Approve all pending requests
-                pending_requests = claim.approval_request_ids.filtered(
-                    lambda r: r.state in ['pending', 'waiting']
-                )
-                
-                for request in pending_requests:
-                    request.write({
-                        'state': 'approved',
-                        'approval_date': fields.Datetime.now(),
-                        'comments': 'Demo auto-approval'
-                    })
-                
-                claim.write({'state': 'approved'})
-                claim.message_post(
-                    body=_('Demo: All approvals simulated'),
-                    message_type='notification'
-                )
+        claims = self.filtered_domain([('state', 'in', ['submitted', 'under_review'])])
+        if not claims:
+            return
+        
+        # Approve all pending requests
+        pending_requests = claims.approval_request_ids.filtered_domain([
+            ('state', 'in', ['pending', 'waiting'])
+        ])
+        pending_requests.write({
+            'state': 'approved',
+            'approval_date': fields.Datetime.now(),
+            'comments': 'Demo auto-approval'
+        })
+        
+        claims.write({'state': 'approved'})
+        claims._message_log_batch(
+            bodies={claim.id: _('Demo: All approvals simulated') for claim in claims}
+        )
 
     # Constraints and Validations
     @api.constrains('expense_line_ids')
@@ -1,10 +1,16 @@
 # type: ignore
 import logging
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
 
 _logger = logging.getLogger(__name__)
 
+TRAVEL_CATEGORY_CODES = ('TRAVEL', 'FUEL', 'HOTEL')
+
+# Failed OCR runs after which the cron stops picking up a receipt
+OCR_MAX_ATTEMPTS = 3
+
 
 class ExpenseLine(models.Model):
     _name = 'expense.line'
@@ -116,6 +122,13 @@ class ExpenseLine(models.Model):
         help='Whether OCR has been run on the receipt'
     )
     
+    ocr_attempts = fields.Integer(
+        string='OCR Attempts',
+        default=0,
+        copy=False,
+        help='Failed background OCR runs; the receipt is skipped after %s' % OCR_MAX_ATTEMPTS
+    )
+    
     ocr_confidence = fields.Float(
         string='OCR Confidence',
         help='Confidence level of OCR processing (0.0-1.0)'
@@ -176,6 +189,22 @@ class ExpenseLine(models.Model):
         help='External reference number'
     )
     
+    _sql_constraints = [
+        ('unit_amount_nonneg', 'CHECK(unit_amount >= 0)', 'Unit amount cannot be negative.'),
+        ('quantity_positive', 'CHECK(quantity > 0)', 'Quantity must be greater than zero.'),
+        ('ocr_confidence_range', 'CHECK(ocr_confidence IS NULL OR ocr_confidence BETWEEN 0 AND 1)',
+         'OCR confidence must be between 0.0 and 1.0'),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Claim line lists filter by claim and sort by _order
+        tools.create_index(
+            self._cr, 'expense_line_claim_date_idx', self._table,
+            ['claim_id', 'date DESC', 'id DESC']
+        )
+        return res
+
     # Computed Fields
     @api.depends('unit_amount', 'quantity')
     def _compute_total_amount(self):
@@ -189,90 +218,156 @@ class ExpenseLine(models.Model):
 
     @api.depends('ocr_confidence', 'company_id')
     def _compute_ocr_confidence_low(self):
+        thresholds = {
+            company.id: company.ocr_confidence_threshold
+            for company in self.mapped('company_id')
+        }
         for line in self:
-            if line.ocr_confidence and line.company_id:
-                threshold = line.company_id.ocr_confidence_threshold
-                line.ocr_confidence_low = line.ocr_confidence < threshold
-            else:
-                line.ocr_confidence_low = False
+            threshold = thresholds.get(line.company_id.id)
+            line.ocr_confidence_low = bool(
+                line.ocr_confidence and threshold is not None and line.ocr_confidence < threshold
+            )
+
+    # CRUD Operations
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        
+        # Match vendors once for the whole batch instead of on every edit
+        lines.action_match_vendor()
+        
+        if lines.filtered('receipt_attachment_id'):
+            self._trigger_receipt_processing()
+        
+        return lines
+
+    def write(self, vals):
+        # A new receipt gets a fresh set of background OCR attempts
+        if vals.get('receipt_attachment_id') and 'ocr_attempts' not in vals:
+            vals = dict(vals, ocr_attempts=0)
+        res = super().write(vals)
+        if vals.get('vendor_name'):
+            self.action_match_vendor()
+        if vals.get('receipt_attachment_id'):
+            self._trigger_receipt_processing()
+        return res
 
     # Actions
     def action_process_ocr(self):
-        """Process receipt with OCR"""
+        """Process receipts with OCR"""
         for line in self:
             if not line.receipt_attachment_id:
                 raise UserError(_('No receipt attached to process.'))
             
             if line.ocr_processed:
                 raise UserError(_('OCR has already been processed for this receipt.'))
+        
+        try:
+            results = self.env['ocr.service'].process_receipts(self.mapped('receipt_attachment_id'))
+        except Exception as e:
+            _logger.error("OCR processing failed for lines %s: %s", self.ids, e)
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('OCR Error'),
+                    'message': _('OCR processing error: %s') % str(e),
+                    'type': 'danger',
+                }
+            }
+        
+        # Group lines sharing the same update values into a single write
+        vals_groups = {}
+        bodies = {}
+        for line in self:
+            result = results.get(line.receipt_attachment_id.id)
+            if not result:
+                continue
+            
+            # Update line with OCR results
+            update_vals = {
+                'ocr_processed': True,
+                'ocr_confidence': result.get('confidence', 0.0),
+                'ocr_extracted_data': result.get('raw_text', ''),
+            }
             
-            try:
-                ocr_service = self.env['ocr.service']
-                result = ocr_service.process_receipt(line.receipt_attachment_id)
+            # Auto-fill fields if confidence is high enough
+            extracted_data = result.get('extracted_data', {})
+            if extracted_data and result.get('confidence', 0) >= line.company_id.ocr_confidence_threshold:
+                if extracted_data.get('amount') and not line.unit_amount:
+                    update_vals['unit_amount'] = extracted_data['amount']
                 
-                if result:
-                    # Update line with OCR results
-                    update_vals = {
-                        'ocr_processed': True,
-                        'ocr_confidence': result.get('confidence', 0.0),
-                        'ocr_extracted_data': result.get('raw_text', ''),
-                    }
-                    
-                    # Auto-fill fields if confidence is high enough
-                    extracted_data = result.get('extracted_data', {})
-                    if extracted_data and result.get('confidence', 0) >= line.company_id.ocr_confidence_threshold:
-                        if extracted_data.get('amount') and not line.unit_amount:
-                            update_vals['unit_amount'] = extracted_data['amount']
-                        
-                        if extracted_data.get('date') and not line.date:
-                            update_vals['date'] = extracted_data['date']
-                        
-                        if extracted_data.get('vendor') and not line.vendor_name:
-                            update_vals['vendor_name'] = extracted_data['vendor']
-                        
-                        if extracted_data.get('description') and not line.name:
-                            update_vals['name'] = extracted_data['description']
-                    
-                    line.write(update_vals)
-                    
-                    # Log OCR processing
-                    line.message_post(
-                        body=_('OCR processed with confidence: %.1f%%') % (result.get('confidence', 0) * 100),
-                        message_type='notification'
-                    )
-                    
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'title': _('OCR Processed'),
-                            'message': _('Receipt processed successfully. Confidence: %.1f%%') % 
-                                     (result.get('confidence', 0) * 100),
-                            'type': 'success' if not line.ocr_confidence_low else 'warning',
-                        }
-                    }
-                else:
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'title': _('OCR Failed'),
-                            'message': _('Failed to process receipt. Please enter details manually.'),
-                            'type': 'warning',
-                        }
-                    }
-                    
-            except Exception as e:
-                _logger.error(f"OCR processing failed for line {line.id}: {e}")
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('OCR Error'),
-                        'message': _('OCR processing error: %s') % str(e),
-                        'type': 'danger',
-                    }
+                if extracted_data.get('date') and not line.date:
+                    update_vals['date'] = extracted_data['date']
+                
+                if extracted_data.get('vendor') and not line.vendor_name:
+                    update_vals['vendor_name'] = extracted_data['vendor']
+                
+                if extracted_data.get('description') and not line.name:
+                    update_vals['name'] = extracted_data['description']
+            
+            vals_groups.setdefault(tuple(sorted(update_vals.items())), []).append(line.id)
+            bodies[line.id] = _('OCR processed with confidence: %.1f%%') % (result.get('confidence', 0) * 100)
+        
+        if not bodies:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('OCR Failed'),
+                    'message': _('Failed to process receipt. Please enter details manually.'),
+                    'type': 'warning',
                 }
+            }
+        
+        for vals_key, line_ids in vals_groups.items():
+            self.browse(line_ids).write(dict(vals_key))
+        
+        # Log OCR processing
+        processed_lines = self.browse(list(bodies))
+        processed_lines._message_log_batch(bodies=bodies)
+        
+        if len(processed_lines) == 1:
+            message = _('Receipt processed successfully. Confidence: %.1f%%') % (
+                processed_lines.ocr_confidence * 100)
+        else:
+            message = _('%s receipts processed successfully.') % len(processed_lines)
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('OCR Processed'),
+                'message': message,
+                'type': 'warning' if any(processed_lines.mapped('ocr_confidence_low')) else 'success',
+            }
+        }
+
+    def action_bulk_reprocess_receipts(self):
+        """Queue receipts for OCR reprocessing by the background cron"""
+        lines = self.filtered('receipt_attachment_id')
+        if not lines:
+            raise UserError(_('No receipts attached to reprocess.'))
+        
+        # Forget cached results so the receipts are really processed again
+        checksums = [checksum for checksum in lines.mapped('receipt_attachment_id.checksum') if checksum]
+        self.env['ocr.cache'].sudo().search([
+            ('checksum', 'in', checksums),
+            ('company_id', 'in', lines.company_id.ids),
+        ]).unlink()
+        
+        lines.write({'ocr_processed': False, 'ocr_attempts': 0})
+        self._trigger_receipt_processing()
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('OCR Reprocessing Queued'),
+                'message': _('%s receipts will be processed in the background.') % len(lines),
+                'type': 'success',
+            }
+        }
 
     def action_upload_receipt(self):
         """Action to upload receipt"""
@@ -302,23 +397,76 @@ class ExpenseLine(models.Model):
 
     def action_match_vendor(self):
         """Try to match vendor name with existing partners"""
-        for line in self:
-            if not line.vendor_name or line.vendor_id:
-                continue
-            
-            # Search for existing partner
-            partner = self.env['res.partner'].search([
-                '|',
-                ('name', 'ilike', line.vendor_name),
-                ('display_name', 'ilike', line.vendor_name)
-            ], limit=1)
-            
+        lines = self.filtered(lambda line: line.vendor_name and not line.vendor_id)
+        if not lines:
+            return
+        
+        lines_by_name = {}
+        for line in lines:
+            lines_by_name.setdefault(line.vendor_name.strip().lower(), []).append(line.id)
+        
+        # One partner search for all distinct vendor names, matched in Python
+        partners = self.env['res.partner'].search_fetch(expression.OR([
+            ['|', ('name', 'ilike', vendor_name), ('complete_name', 'ilike', vendor_name)]
+            for vendor_name in lines_by_name
+        ]), ['name', 'complete_name'])
+        
+        line_ids_by_partner = {}
+        for vendor_name, line_ids in lines_by_name.items():
+            partner = next((
+                partner for partner in partners
+                if vendor_name in (partner.name or '').lower()
+                or vendor_name in (partner.complete_name or '').lower()
+            ), None)
             if partner:
-                line.vendor_id = partner.id
-                line.message_post(
-                    body=_('Vendor matched: %s') % partner.name,
-                    message_type='notification'
-                )
+                line_ids_by_partner.setdefault(partner, []).extend(line_ids)
+        
+        bodies = {}
+        for partner, line_ids in line_ids_by_partner.items():
+            self.browse(line_ids).write({'vendor_id': partner.id})
+            bodies.update(dict.fromkeys(line_ids, _('Vendor matched: %s') % partner.name))
+        
+        if bodies:
+            self.browse(list(bodies))._message_log_batch(bodies=bodies)
+
+    # Automated Actions
+    @api.model
+    def _cron_process_pending_receipts(self, batch_size=50):
+        """Cron job to run OCR on uploaded receipts outside of user requests"""
+        lines = self.search([
+            ('receipt_attachment_id', '!=', False),
+            ('ocr_processed', '=', False),
+            ('ocr_attempts', '<', OCR_MAX_ATTEMPTS),
+            ('company_id.ocr_enabled', '=', True)
+        ], order='id', limit=batch_size)
+        
+        if not lines:
+            return 0
+        
+        # OCR thresholds and Google Vision settings are per company
+        for company in lines.company_id:
+            company_lines = lines.filtered(lambda line: line.company_id == company)
+            company_lines.with_company(company).action_process_ocr()
+        
+        # Count the failures so a broken receipt can't block newer ones forever
+        failed_by_attempts = {}
+        for line in lines.filtered(lambda line: not line.ocr_processed):
+            failed_by_attempts.setdefault(line.ocr_attempts + 1, []).append(line.id)
+        for attempts, line_ids in failed_by_attempts.items():
+            self.browse(line_ids).write({'ocr_attempts': attempts})
+        
+        # Continue with the next batch; failed lines drop out after OCR_MAX_ATTEMPTS
+        if len(lines) == batch_size:
+            self._trigger_receipt_processing()
+        
+        return len(lines)
+
+    @api.model
+    def _trigger_receipt_processing(self):
+        """Schedule the receipt OCR cron to run as soon as possible"""
+        cron = self.env.ref('smart_expense_management.ir_cron_process_receipts', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
 
     # Utility Methods
     def _prepare_account_move_line(self):
@@ -336,19 +484,49 @@ class ExpenseLine(models.Model):
             'ref': self.reference,
         }
 
-    # Constraints
-    @api.constrains('unit_amount')
-    def _check_unit_amount(self):
-        for line in self:
-            if line.unit_amount < 0:
-                raise ValidationError(_('Unit amount cannot be negative.'))
-
-    @api.constrains('quantity')
-    def _check_quantity(self):
-        for line in self:
-            if line.quantity <= 0:
-                raise ValidationError(_('Quantity must be greater than zero.'))
+    def _prepare_move_lines_bulk(self):
+        """
+        Prepare account move line data for many lines at once
+        
+        Reads the needed columns of saved lines in one query instead of going
+        through the ORM cache field by field for every line. New records (in
+        an onchange) are not in the database and use the field values instead.
+        
+        Returns:
+            list: Move line values, in the order of the recordset
+        """
+        if not self:
+            return []
+        
+        move_lines = {}
+        saved_lines = self.browse([line_id for line_id in self._ids if isinstance(line_id, int)])
+        if saved_lines:
+            saved_lines.flush_recordset(['name', 'category_id', 'total_amount', 'vendor_id', 'date', 'reference'])
+            self.env['expense.category'].flush_model(['account_id'])
+            self.env.cr.execute("""
+                SELECT l.id, l.name, c.account_id, l.total_amount, l.vendor_id, l.date, l.reference
+                  FROM expense_line l
+                  LEFT JOIN expense_category c ON c.id = l.category_id
+                 WHERE l.id = ANY(%s)
+            """, [saved_lines.ids])
+            
+            for line_id, name, account_id, total_amount, vendor_id, date, reference in self.env.cr.fetchall():
+                total_amount = total_amount or 0.0
+                move_lines[line_id] = {
+                    'name': name,
+                    'account_id': account_id or False,
+                    'debit': total_amount if total_amount > 0 else 0,
+                    'credit': abs(total_amount) if total_amount < 0 else 0,
+                    'partner_id': vendor_id or False,
+                    'date': date,
+                    'ref': reference or False,
+                }
+        
+        for line in self - saved_lines:
+            move_lines[line.id] = line._prepare_account_move_line()
+        return [move_lines[line_id] for line_id in self._ids]
 
+    # Constraints
     @api.constrains('date', 'claim_id')
     def _check_date(self):
         for line in self:
@@ -357,14 +535,6 @@ class ExpenseLine(models.Model):
                     _('Expense date cannot be after claim date.')
                 )
 
-    @api.constrains('ocr_confidence')
-    def _check_ocr_confidence(self):
-        for line in self:
-            if line.ocr_confidence and not (0.0 <= line.ocr_confidence <= 1.0):
-                raise ValidationError(
-                    _('OCR confidence must be between 0.0 and 1.0')
-                )
-
     # Onchange Methods
     @api.onchange('receipt_attachment_id')
     def _onchange_receipt_attachment(self):
@@ -376,12 +546,6 @@ class ExpenseLine(models.Model):
             # Schedule OCR processing
             self.env.context = dict(self.env.context, auto_process_ocr=True)
 
-    @api.onchange('vendor_name')
-    def _onchange_vendor_name(self):
-        """Auto-match vendor when name is entered"""
-        if self.vendor_name and not self.vendor_id:
-            self.action_match_vendor()
-
     @api.onchange('category_id')
     def _onchange_category_id(self):
         """Update fields based on category"""
@@ -391,7 +555,7 @@ class ExpenseLine(models.Model):
                 self.currency_id = self.category_id.default_currency_id
             
             # Set travel expense flag
-            if 'travel' in self.category_id.name.lower():
+            if self.category_id.is_travel_category:
                 self.is_travel_expense = True
 
 
@@ -446,6 +610,13 @@ class ExpenseCategory(models.Model):
         help='Whether receipts are mandatory for this category'
     )
     
+    is_travel_category = fields.Boolean(
+        string='Travel Category',
+        compute='_compute_is_travel_category',
+        store=True,
+        help='Expenses in this category are flagged as travel expenses'
+    )
+    
     # Approval Settings
     auto_approve_limit = fields.Monetary(
         string='Auto-approve Limit',
@@ -465,12 +636,23 @@ class ExpenseCategory(models.Model):
         compute='_compute_expense_count'
     )
 
+    @api.depends('code')
+    def _compute_is_travel_category(self):
+        # Codes are language-independent, unlike the translatable name
+        for category in self:
+            category.is_travel_category = category.code in TRAVEL_CATEGORY_CODES
+
     @api.depends()
     def _compute_expense_count(self):
+        # Count lines for all categories in one grouped query
+        groups = self.env['expense.line'].read_group(
+            [('category_id', 'in', self.ids)],
+            ['category_id'],
+            ['category_id']
+        )
+        counts = {group['category_id'][0]: group['category_id_count'] for group in groups}
         for category in self:
-            category.expense_count = self.env['expense.line'].search_count([
-                ('category_id', '=', category.id)
-            ])
+            category.expense_count = counts.get(category.id, 0)
 
     def action_view_expenses(self):
         """View expenses in this category"""
@@ -500,12 +682,10 @@ class ExpenseCategory(models.Model):
             {'name': 'Miscellaneous', 'code': 'MISC', 'requires_receipt': False},
         ]
         
-        created_categories = self.env['expense.category']
-        
-        for cat_data in default_categories:
-            existing = self.search([('code', '=', cat_data['code'])], limit=1)
-            if not existing:
-                category = self.create(cat_data)
-                created_categories |= category
+        codes = [cat_data['code'] for cat_data in default_categories]
+        existing_codes = set(self.search([('code', 'in', codes)]).mapped('code'))
         
-        return created_categories
+        return self.create([
+            cat_data for cat_data in default_categories
+            if cat_data['code'] not in existing_codes
+        ])
@@ -13,13 +13,20 @@ Usage:
 Environment Variables:
     FLASK_PORT: Port to run on (default: 8080)
     FLASK_HOST: Host to bind to (default: 0.0.0.0)
+    MOCK_DELAY_MIN: Minimum simulated latency in seconds (default: 0.1)
+    MOCK_DELAY_MAX: Maximum simulated latency in seconds (default: 0.5)
+    FLASK_THREADS: Number of server worker threads (default: 16)
 """
 
 import os
+import gzip
 import json
 import time
 import random
-from flask import Flask, jsonify, request
+import functools
+import threading
+from collections import defaultdict, deque
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -29,14 +36,29 @@ CORS(app)
 FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
 PORT = int(os.getenv('FLASK_PORT', 8080))
 HOST = os.getenv('FLASK_HOST', '0.0.0.0')
+DELAY_MIN = float(os.getenv('MOCK_DELAY_MIN', 0.1))
+DELAY_MAX = float(os.getenv('MOCK_DELAY_MAX', 0.5))
+THREADS = int(os.getenv('FLASK_THREADS', 16))
 
 # Rate limiting simulation
-request_counts = {}
+request_counts = defaultdict(deque)
+request_counts_lock = threading.Lock()
+total_requests = 0
 RATE_LIMIT_PER_MINUTE = 60
 
+# Fixtures served by /v3.1/all, keyed by the requested fields
+COUNTRIES_FIXTURES = {
+    frozenset(('name', 'currencies')): 'mock_restcountries.json',
+    frozenset(('name', 'currencies', 'cca2')): 'mock_restcountries.json',
+}
 
+# Per-thread random generators for the delay/failure simulation
+_thread_local = threading.local()
+
+
+@functools.lru_cache(maxsize=64)
 def load_fixture(filename):
-    """Load JSON fixture file"""
+    """Load JSON fixture file (parsed once, then served from memory)"""
     try:
         filepath = os.path.join(FIXTURES_DIR, filename)
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -46,39 +68,82 @@ def load_fixture(filename):
         return None
 
 
+@functools.lru_cache(maxsize=64)
+def fixture_body(filename, date=None):
+    """Serialized JSON body of a fixture, optionally stamped with a date"""
+    data = load_fixture(filename)
+    if data is None:
+        return None
+    if date is not None:
+        data = dict(data, date=date)
+    return json.dumps(data).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=64)
+def fixture_body_gzip(filename):
+    """Gzip-compressed JSON body of a fixture"""
+    body = fixture_body(filename)
+    if body is None:
+        return None
+    return gzip.compress(body, 6)
+
+
+def json_response(body, gzipped=False):
+    """Wrap a pre-serialized JSON body in a response"""
+    headers = {'Vary': 'Accept-Encoding'}
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def accepts_gzip():
+    """Whether the client accepts gzip-encoded responses"""
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
 def simulate_rate_limiting():
     """Simulate rate limiting"""
+    global total_requests
     client_ip = request.remote_addr
     current_time = time.time()
     
-    # Clean old entries
     minute_ago = current_time - 60
-    if client_ip in request_counts:
-        request_counts[client_ip] = [
-            timestamp for timestamp in request_counts[client_ip] 
-            if timestamp > minute_ago
-        ]
-    else:
-        request_counts[client_ip] = []
-    
-    # Check rate limit
-    if len(request_counts[client_ip]) >= RATE_LIMIT_PER_MINUTE:
-        return True
-    
-    # Add current request
-    request_counts[client_ip].append(current_time)
-    return False
+    with request_counts_lock:
+        timestamps = request_counts[client_ip]
+        
+        # Clean old entries
+        while timestamps and timestamps[0] <= minute_ago:
+            timestamps.popleft()
+        
+        # Check rate limit
+        if len(timestamps) >= RATE_LIMIT_PER_MINUTE:
+            return True
+        
+        # Add current request
+        timestamps.append(current_time)
+        total_requests += 1
+        return False
+
+
+def get_rng():
+    """Random generator owned by the current thread"""
+    rng = getattr(_thread_local, 'rng', None)
+    if rng is None:
+        rng = _thread_local.rng = random.Random()
+    return rng
 
 
 def simulate_network_delay():
     """Simulate network delay"""
-    delay = random.uniform(0.1, 0.5)  # 100-500ms delay
+    if DELAY_MAX <= 0:
+        return
+    delay = get_rng().uniform(DELAY_MIN, DELAY_MAX)
     time.sleep(delay)
 
 
 def simulate_random_failure():
     """Simulate random API failures (5% chance)"""
-    return random.random() < 0.05
+    return get_rng().random() < 0.05
 
 
 @app.route('/health')
@@ -105,15 +170,20 @@ def rest_countries_all():
         return jsonify({'error': 'Internal server error'}), 500
     
     # Check query parameters
-    fields = request.args.get('fields', '')
+    fields = frozenset(filter(None, request.args.get('fields', '').split(',')))
+    fixture_filename = COUNTRIES_FIXTURES.get(fields)
     
-    if 'name,currencies' in fields:
+    if fixture_filename:
         # Load countries fixture
-        countries_data = load_fixture('mock_restcountries.json')
+        gzipped = accepts_gzip()
+        if gzipped:
+            countries_body = fixture_body_gzip(fixture_filename)
+        else:
+            countries_body = fixture_body(fixture_filename)
         
-        if countries_data:
-            app.logger.info(f"Served countries data: {len(countries_data)} countries")
-            return jsonify(countries_data)
+        if countries_body:
+            app.logger.info(f"Served countries data: {len(load_fixture(fixture_filename))} countries")
+            return json_response(countries_body, gzipped=gzipped)
         else:
             return jsonify({'error': 'Fixture data not available'}), 500
     
@@ -137,14 +207,12 @@ def exchange_rates(currency):
     
     # Load rates fixture
     fixture_filename = f'mock_rates_{currency}.json'
-    rates_data = load_fixture(fixture_filename)
+    # Update date to current date
+    rates_body = fixture_body(fixture_filename, time.strftime('%Y-%m-%d'))
     
-    if rates_data:
-        # Update date to current date
-        rates_data['date'] = time.strftime('%Y-%m-%d')
-        
+    if rates_body:
         app.logger.info(f"Served exchange rates for {currency}")
-        return jsonify(rates_data)
+        return json_response(rates_body)
     else:
         # Return error for unsupported currency
         return jsonify({
@@ -193,8 +261,6 @@ def google_vision_ocr():
 @app.route('/stats')
 def api_stats():
     """Get API usage statistics"""
-    total_requests = sum(len(timestamps) for timestamps in request_counts.values())
-    
     return jsonify({
         'total_requests': total_requests,
         'active_clients': len(request_counts),
@@ -210,8 +276,10 @@ def api_stats():
 @app.route('/reset')
 def reset_stats():
     """Reset API statistics (for testing)"""
-    global request_counts
-    request_counts = {}
+    global total_requests
+    with request_counts_lock:
+        request_counts.clear()
+        total_requests = 0
     
     return jsonify({
         'message': 'Statistics reset',
@@ -226,7 +294,7 @@ def not_found(error):
         'error': 'Endpoint not found',
         'available_endpoints': [
             '/health',
-            '/v3.1/all?fields=name,currencies',
+            '/v3.1/all?fields=name,currencies,cca2',
             '/v4/latest/{currency}',
             '/vision/v1/images:annotate',
             '/stats',
@@ -259,4 +327,5 @@ if __name__ == '__main__':
         else:
             print(f"❌ Fixture missing: {fixture}")
     
-    app.run(host=HOST, port=PORT, debug=True)
+    from waitress import serve
+    serve(app, host=HOST, port=PORT, threads=THREADS)
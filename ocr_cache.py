@@ -0,0 +1,148 @@
+# type: ignore
+import json
+import logging
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class OCRCache(models.Model):
+    _name = 'ocr.cache'
+    _description = 'OCR Result Cache'
+    _rec_name = 'checksum'
+
+    checksum = fields.Char(
+        string='Attachment Checksum',
+        required=True,
+        index=True,
+        help='SHA1 checksum of the receipt file the result belongs to'
+    )
+    
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        index=True,
+        ondelete='cascade',
+        default=lambda self: self.env.company,
+        help='Company whose OCR confidence threshold the result was filtered with'
+    )
+    
+    raw_text = fields.Text(
+        string='Raw Text',
+        help='Raw text extracted from the receipt'
+    )
+    
+    extracted_data_json = fields.Text(
+        string='Extracted Data JSON',
+        help='JSON string containing the structured data extracted from the text'
+    )
+    
+    confidence = fields.Float(
+        string='Confidence',
+        help='Confidence level of the OCR result (0.0-1.0)'
+    )
+    
+    source = fields.Char(
+        string='Source',
+        help='OCR engine that produced the result'
+    )
+
+    _sql_constraints = [
+        ('unique_checksum_company', 'UNIQUE(checksum, company_id)',
+         'Only one OCR result per receipt file and company is allowed.'),
+    ]
+
+    @api.model
+    def get_cached_results(self, attachments):
+        """
+        Get cached OCR results for receipt attachments
+        
+        Results are per company: the text was filtered with the company's
+        OCR confidence threshold.
+        
+        Args:
+            attachments (ir.attachment): Receipt attachments
+        
+        Returns:
+            dict: {attachment_id: OCR result} for attachments with a cached result
+        """
+        checksums = {attachment.checksum for attachment in attachments if attachment.checksum}
+        if not checksums:
+            return {}
+        
+        entries = {entry.checksum: entry for entry in self.search([
+            ('checksum', 'in', list(checksums)),
+            ('company_id', '=', self.env.company.id),
+        ])}
+        
+        results = {}
+        for attachment in attachments:
+            entry = entries.get(attachment.checksum)
+            if entry:
+                results[attachment.id] = entry._to_ocr_result()
+        return results
+
+    @api.model
+    def store_results(self, attachments, results):
+        """
+        Store successful OCR results for receipt attachments, for the current company
+        
+        Args:
+            attachments (ir.attachment): Receipt attachments
+            results (dict): {attachment_id: OCR result}
+        
+        Returns:
+            ocr.cache: Created cache entries
+        """
+        vals_by_checksum = {}
+        for attachment in attachments:
+            result = results.get(attachment.id)
+            if not attachment.checksum or not result or not result.get('success'):
+                continue
+            # Mock results only stand in for missing OCR libraries
+            if result.get('source') == 'mock':
+                continue
+            vals_by_checksum[attachment.checksum] = {
+                'checksum': attachment.checksum,
+                'company_id': self.env.company.id,
+                'raw_text': result.get('raw_text', ''),
+                'extracted_data_json': json.dumps(result.get('extracted_data', {}), default=str),
+                'confidence': result.get('confidence', 0.0),
+                'source': result.get('source'),
+            }
+        
+        if not vals_by_checksum:
+            return self.browse()
+        
+        existing = set(self.search([
+            ('checksum', 'in', list(vals_by_checksum)),
+            ('company_id', '=', self.env.company.id),
+        ]).mapped('checksum'))
+        vals_list = [vals for checksum, vals in vals_by_checksum.items() if checksum not in existing]
+        if not vals_list:
+            return self.browse()
+        
+        try:
+            with self.env.cr.savepoint():
+                return self.create(vals_list)
+        except Exception as e:
+            # Another transaction cached the same receipt first
+            _logger.warning("Failed to cache OCR results: %s", e)
+            return self.browse()
+
+    def _to_ocr_result(self):
+        """Build an OCR result dict from a cache entry"""
+        self.ensure_one()
+        extracted_data = json.loads(self.extracted_data_json or '{}')
+        if extracted_data.get('date'):
+            extracted_data['date'] = fields.Date.to_date(extracted_data['date'])
+        
+        return {
+            'success': True,
+            'confidence': self.confidence,
+            'raw_text': self.raw_text or '',
+            'extracted_data': extracted_data,
+            'source': self.source,
+            'cached': True
+        }
@@ -1,13 +1,113 @@
 # type: ignore
+import calendar
 import logging
 import os
+import random
 import re
-from datetime import datetime
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from odoo import models, api, _
 from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+try:
+    from google.cloud import vision
+except ImportError:
+    vision = None
+
+# Maximum number of images per Google Vision batch request
+VISION_BATCH_SIZE = 16
+
+# Largest image side passed to Tesseract; receipts need no more resolution
+TESSERACT_MAX_DIMENSION = 1600
+
+# Pillow decoders to try for known receipt mimetypes
+_PIL_FORMATS = {
+    'image/jpeg': ['JPEG'],
+    'image/png': ['PNG'],
+    'image/tiff': ['TIFF'],
+    'image/gif': ['GIF'],
+    'image/bmp': ['BMP'],
+    'image/webp': ['WEBP'],
+}
+
+# Receipt text patterns
+_AMOUNT_RE = re.compile(r'\$?(\d+(?:,\d{3})*\.\d{2})')  # 123.45, $123.45 or $1,234.56
+# Date patterns with the order of their captured (year/month/day) parts
+_DATE_DISPATCH = [
+    (re.compile(r'(?<!\d)(\d{1,2})[/-](\d{1,2})[/-](\d{4})(?!\d)'), 'mdy'),  # MM/DD/YYYY or DD/MM/YYYY
+    (re.compile(r'(?<!\d)(\d{1,2})[/-](\d{1,2})[/-](\d{2})(?!\d)'), 'mdy'),  # MM/DD/YY or DD/MM/YY
+    (re.compile(r'(?<!\d)(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?!\d)'), 'ymd'),  # YYYY/MM/DD
+]
+_CURRENCY_RE = re.compile(r'\$\d+\.\d{2}|\d+\.\d{2}')
+_DOLLAR_AMOUNT_RE = re.compile(r'\$\d+\.\d{2}')
+_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')
+_KEYWORDS_RE = re.compile(r'total|subtotal|tax', re.IGNORECASE)
+# Every character regex \s matches (str.isspace), not only ASCII whitespace;
+# OCR output often contains NBSP and other Unicode spaces
+_UNICODE_WHITESPACE = ''.join(
+    chr(code) for code in (
+        *range(0x09, 0x0E), *range(0x1C, 0x21), 0x85, 0xA0, 0x1680,
+        *range(0x2000, 0x200B), 0x2028, 0x2029, 0x202F, 0x205F, 0x3000,
+    )
+)
+# str.translate table deleting every character expected on a receipt,
+# so the length of what remains is the number of special characters
+_EXPECTED_CHARS_TABLE = str.maketrans(
+    '', '', string.ascii_letters + string.digits + _UNICODE_WHITESPACE + '.,/$:-'
+)
+_VENDOR_NUM_RE = re.compile(r'^[\d\s.,/$:-]+$')
+_RECEIPT_HEADINGS = frozenset(['TOTAL', 'SUBTOTAL', 'TAX', 'RECEIPT'])
+
+# Retry policy for transient Google Vision errors (quota, 5xx)
+VISION_MAX_ATTEMPTS = 3
+VISION_RETRY_BASE_DELAY = 1.0
+VISION_RETRY_MAX_DELAY = 8.0
+
+# Shared pool for concurrent OCR network calls
+_OCR_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv('OCR_POOL_SIZE', 16)),
+    thread_name_prefix='ocr'
+)
+
+
+# Google Vision client shared by all requests of this process
+_vision_client = None
+_vision_client_lock = threading.Lock()
+
+
+def _get_vision_client():
+    """Return the shared Google Vision client, creating it on first use"""
+    global _vision_client
+    with _vision_client_lock:
+        if _vision_client is None:
+            _vision_client = vision.ImageAnnotatorClient()
+        return _vision_client
+
+
+def _call_with_retry(func, *args, **kwargs):
+    """Call a Google Vision client method, retrying transient errors with backoff"""
+    from google.api_core import exceptions as google_exceptions
+    
+    retryable = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+    )
+    for attempt in range(VISION_MAX_ATTEMPTS):
+        try:
+            return func(*args, **kwargs)
+        except retryable as e:
+            if attempt == VISION_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(VISION_RETRY_MAX_DELAY, VISION_RETRY_BASE_DELAY * 2 ** attempt) + random.random()
+            _logger.warning("Google Vision request failed (%s), retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
 
 class OCRService(models.AbstractModel):
     _name = 'ocr.service'
@@ -27,24 +127,58 @@ class OCRService(models.AbstractModel):
         if not attachment:
             raise UserError(_('No attachment provided for OCR processing'))
         
-        # Check if Google Vision is enabled and available
-        use_google_vision = self._should_use_google_vision()
+        return self.process_receipts(attachment)[attachment.id]
+
+    @api.model
+    def process_receipts(self, attachments):
+        """
+        Process several receipt attachments with OCR
         
-        try:
-            if use_google_vision:
-                return self._process_with_google_vision(attachment)
-            else:
-                return self._process_with_tesseract(attachment)
-                
-        except Exception as e:
-            _logger.error(f"OCR processing failed: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'confidence': 0.0,
-                'raw_text': '',
-                'extracted_data': {}
+        Receipt files that were processed before (same checksum) are served
+        from the OCR cache instead of being processed again.
+        
+        Args:
+            attachments (ir.attachment): Receipt attachments to process
+            
+        Returns:
+            dict: {attachment_id: OCR result} with results as in process_receipt
+        """
+        if not attachments:
+            return {}
+        
+        ocr_cache = self.env['ocr.cache'].sudo()
+        results = ocr_cache.get_cached_results(attachments)
+        pending = attachments.filtered(lambda attachment: attachment.id not in results)
+        if not pending:
+            return results
+        
+        min_confidence = self.env.company.ocr_confidence_threshold * 100
+        
+        # Check if Google Vision is enabled and available
+        if self._should_use_google_vision():
+            try:
+                new_results = self._process_batch_with_google_vision(pending, min_confidence)
+            except Exception as e:
+                # Failed requests already fall back per receipt, this is
+                # for errors before any request was sent (client setup)
+                _logger.error(f"Google Vision batch OCR failed: {e}")
+                new_results = {
+                    attachment.id: self._process_with_tesseract(attachment, min_confidence)
+                    for attachment in pending
+                }
+        else:
+            new_results = {
+                attachment.id: self._process_with_tesseract(attachment, min_confidence)
+                for attachment in pending
             }
+        
+        # Drop the receipt bytes from the record cache so a large batch
+        # doesn't keep every image in memory until the transaction ends
+        pending.invalidate_recordset(['raw', 'datas'])
+        
+        ocr_cache.store_results(pending, new_results)
+        results.update(new_results)
+        return results
 
     @api.model
     def _should_use_google_vision(self):
@@ -60,92 +194,125 @@ class OCRService(models.AbstractModel):
             return False
         
         # Check if API key is configured
-        api_key = company.google_vision_api_key or os.getenv('GOOGLE_VISION_API_KEY')
-        if not api_key:
+        if not (company.google_vision_api_key or os.getenv('GOOGLE_VISION_API_KEY')):
             _logger.warning("Google Vision enabled but no API key configured")
             return False
         
         # Check if library is available
-        try:
-            from google.cloud import vision
-            return True
-        except ImportError:
+        if vision is None:
             _logger.warning("Google Vision library not available, falling back to Tesseract")
             return False
+        return True
 
     @api.model
-    def _process_with_google_vision(self, attachment):
+    def _process_batch_with_google_vision(self, attachments, min_confidence=None):
         """
-        Process receipt using Google Vision API
+        Process several receipts using Google Vision batch annotation
+        
+        Images are sent VISION_BATCH_SIZE at a time in a single
+        batch_annotate_images request instead of one request per receipt,
+        and the batch requests run concurrently on the shared OCR pool.
+        Receipts of a failed request fall back to Tesseract, the others keep
+        their Google Vision results.
         
         Args:
-            attachment (ir.attachment): Receipt attachment
+            attachments (ir.attachment): Receipt attachments
+            min_confidence (float, optional): Minimum word confidence (0-100)
+                for the Tesseract fallback
             
         Returns:
-            dict: OCR results
+            dict: {attachment_id: OCR result}
         """
-        try:
-            from google.cloud import vision
-            import base64
-            
-            # Get API key
-            api_key = self.env.company.google_vision_api_key or os.getenv('GOOGLE_VISION_API_KEY')
-            
-            # Initialize client
-            client = vision.ImageAnnotatorClient()
-            
-            # Prepare image data
-            image_data = base64.b64decode(attachment.datas)
-            image = vision.Image(content=image_data)
-            
-            # Perform text detection
-            response = client.text_detection(image=image)
-            texts = response.text_annotations
-            
-            if response.error.message:
-                raise Exception(f"Google Vision API error: {response.error.message}")
-            
-            if not texts:
-                return {
-                    'success': True,
-                    'confidence': 0.0,
-                    'raw_text': '',
-                    'extracted_data': {},
-                    'source': 'google_vision'
-                }
-            
-            # Extract text
-            raw_text = texts[0].description if texts else ''
-            
-            # Calculate confidence (Google Vision doesn't provide confidence directly)
-            # We'll estimate based on text quality
-            confidence = self._estimate_confidence(raw_text)
-            
-            # Extract structured data
-            extracted_data = self._extract_structured_data(raw_text)
-            
-            _logger.info(f"Google Vision OCR completed with estimated confidence: {confidence}")
+        client = _get_vision_client()
+        feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        
+        # Build requests here: attachment data is read through the environment
+        batches = []
+        for start in range(0, len(attachments), VISION_BATCH_SIZE):
+            batch = attachments[start:start + VISION_BATCH_SIZE]
+            requests = [
+                vision.AnnotateImageRequest(
+                    image=vision.Image(content=attachment.raw),
+                    features=[feature]
+                )
+                for attachment in batch
+            ]
+            batches.append((batch, _OCR_POOL.submit(_call_with_retry, client.batch_annotate_images, requests=requests)))
+        
+        results = {}
+        for batch, future in batches:
+            try:
+                response = future.result()
+            except Exception as e:
+                _logger.error("Google Vision batch OCR failed for %d receipts: %s", len(batch), e)
+                # Fallback to Tesseract
+                for attachment in batch:
+                    results[attachment.id] = self._process_with_tesseract(attachment, min_confidence)
+                continue
+            for attachment, image_response in zip(batch, response.responses):
+                results[attachment.id] = self._parse_google_vision_response(
+                    attachment, image_response, min_confidence)
+        
+        return results
+
+    @api.model
+    def _parse_google_vision_response(self, attachment, response, min_confidence=None):
+        """
+        Build OCR results from a Google Vision text detection response
+        
+        Args:
+            attachment (ir.attachment): Receipt attachment the response is for
+            response: Google Vision AnnotateImageResponse
+            min_confidence (float, optional): Minimum word confidence (0-100)
+                for the Tesseract fallback
             
+        Returns:
+            dict: OCR results, from Tesseract if Google Vision reported an error
+        """
+        if response.error.message:
+            _logger.error(f"Google Vision API error: {response.error.message}")
+            # Fallback to Tesseract
+            return self._process_with_tesseract(attachment, min_confidence)
+        
+        texts = response.text_annotations
+        if not texts:
             return {
                 'success': True,
-                'confidence': confidence,
-                'raw_text': raw_text,
-                'extracted_data': extracted_data,
+                'confidence': 0.0,
+                'raw_text': '',
+                'extracted_data': {},
                 'source': 'google_vision'
             }
-            
-        except Exception as e:
-            _logger.error(f"Google Vision OCR failed: {e}")
-            # Fallback to Tesseract
-            return self._process_with_tesseract(attachment)
+        
+        # Extract text
+        raw_text = texts[0].description
+        
+        # Calculate confidence (Google Vision doesn't provide confidence directly)
+        # We'll estimate based on text quality
+        confidence = self._estimate_confidence(raw_text)
+        
+        # Extract structured data
+        extracted_data = self._extract_structured_data(raw_text)
+        
+        _logger.info(f"Google Vision OCR completed with estimated confidence: {confidence}")
+        
+        return {
+            'success': True,
+            'confidence': confidence,
+            'raw_text': raw_text,
+            'extracted_data': extracted_data,
+            'source': 'google_vision'
+        }
 
     @api.model
-    def _process_with_tesseract(self, attachment):
+    def _process_with_tesseract(self, attachment, min_confidence=None):
         """
         Process receipt using Tesseract OCR
         
         Args:
             attachment (ir.attachment): Receipt attachment
+            min_confidence (float, optional): Minimum word confidence (0-100).
+                Defaults to the company's OCR confidence threshold.
             
         Returns:
             dict: OCR results
@@ -154,15 +321,15 @@ class OCRService(models.AbstractModel):
             import pytesseract
             from PIL import Image
             import io
-            import base64
             
-            # Decode image data
-            image_data = base64.b64decode(attachment.datas)
-            image = Image.open(io.BytesIO(image_data))
+            # Read image data
+            image = Image.open(io.BytesIO(attachment.raw), formats=_PIL_FORMATS.get(attachment.mimetype))
             
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # Downscale large photos and drop color, which Tesseract doesn't need
+            if max(image.size) > TESSERACT_MAX_DIMENSION:
+                image.thumbnail((TESSERACT_MAX_DIMENSION, TESSERACT_MAX_DIMENSION), Image.Resampling.LANCZOS)
+            if image.mode != 'L':
+                image = image.convert('L')
             
             # Get OCR configuration
             config = self._get_tesseract_config()
@@ -174,8 +341,11 @@ class OCRService(models.AbstractModel):
                 output_type=pytesseract.Output.DICT
             )
             
-            # Extract text and calculate confidence
-            raw_text = pytesseract.image_to_string(image, config=config)
+            # Extract text and calculate confidence from the same OCR run,
+            # leaving out words below the company's confidence threshold
+            if min_confidence is None:
+                min_confidence = self.env.company.ocr_confidence_threshold * 100
+            raw_text = self._build_tesseract_text(ocr_data, min_confidence)
             confidence = self._calculate_tesseract_confidence(ocr_data)
             
             # Extract structured data
@@ -210,6 +380,28 @@ class OCRService(models.AbstractModel):
         # Optimize for receipt text
         return '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/$:-'
 
+    @api.model
+    def _build_tesseract_text(self, ocr_data, min_confidence=0):
+        """
+        Rebuild the receipt text from Tesseract word data
+        
+        Args:
+            ocr_data (dict): Tesseract OCR output data
+            min_confidence (float): Minimum word confidence (0-100) to keep
+            
+        Returns:
+            str: Recognized words, one text line per Tesseract line
+        """
+        lines = {}
+        for word, conf, block_num, par_num, line_num in zip(
+                ocr_data.get('text', []), ocr_data.get('conf', []),
+                ocr_data.get('block_num', []), ocr_data.get('par_num', []),
+                ocr_data.get('line_num', [])):
+            if conf > 0 and conf >= min_confidence and word.strip():
+                lines.setdefault((block_num, par_num, line_num), []).append(word)
+        
+        return '\n'.join(' '.join(words) for words in lines.values())
+
     @api.model
     def _calculate_tesseract_confidence(self, ocr_data):
         """
@@ -243,24 +435,27 @@ class OCRService(models.AbstractModel):
         if not text:
             return 0.0
         
+        # Penalize for too many special characters (OCR errors)
+        special_char_ratio = len(text.translate(_EXPECTED_CHARS_TABLE)) / len(text)
+        penalty = special_char_ratio if special_char_ratio > 0.1 else 0.0
+        
+        # Even with every pattern bonus the score would clamp to zero
+        if penalty >= 0.9:
+            return 0.0
+        
         # Basic heuristics for confidence estimation
-        score = 0.5  # Base score
+        score = 0.5 - penalty  # Base score
         
         # Check for common receipt patterns
-        if re.search(r'\$\d+\.\d{2}|\d+\.\d{2}', text):  # Currency amounts
+        if _CURRENCY_RE.search(text):  # Currency amounts
             score += 0.2
         
-        if re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', text):  # Dates
+        if _DATE_RE.search(text):  # Dates
             score += 0.1
         
-        if re.search(r'total|subtotal|tax', text, re.IGNORECASE):  # Receipt keywords
+        if _KEYWORDS_RE.search(text):  # Receipt keywords
             score += 0.1
         
-        # Penalize for too many special characters (OCR errors)
-        special_char_ratio = len(re.findall(r'[^a-zA-Z0-9\s.,/$:-]', text)) / len(text)
-        if special_char_ratio > 0.1:
-            score -= special_char_ratio
-        
         return max(0.0, min(1.0, score))
 
     @api.model
@@ -279,8 +474,33 @@ class OCRService(models.AbstractModel):
         
         extracted = {}
         
-        # Extract amounts (look for currency patterns)
-        amounts = self._extract_amounts(raw_text)
+        # Walk the non-empty lines once, collecting amounts and the
+        # vendor/description candidates as we go
+        amounts = []
+        vendor = description = None
+        lines = (line.strip() for line in raw_text.split('\n'))
+        for index, line in enumerate(line for line in lines if line):
+            # Look for currency patterns, removing commas
+            amounts.extend(float(match.replace(',', '')) for match in _AMOUNT_RE.findall(line))
+            
+            # Usually the vendor name is in the first few lines
+            # Skip very short lines or lines with only numbers/symbols
+            if (vendor is None and index < 3 and
+                len(line) > 3 and
+                not line.isdigit() and
+                not _VENDOR_NUM_RE.match(line)):
+                vendor = line
+            
+            # Description is the first line that isn't clearly an amount,
+            # a date or a receipt heading
+            if (description is None and
+                len(line) > 5 and
+                not _DOLLAR_AMOUNT_RE.search(line) and
+                not _DATE_RE.search(line) and
+                line.upper() not in _RECEIPT_HEADINGS):
+                description = line
+        
+        amounts = [amount for amount in amounts if 0.01 <= amount <= 100000]  # Reasonable range
         if amounts:
             # Use the largest amount as the total (common pattern)
             extracted['amount'] = max(amounts)
@@ -291,103 +511,37 @@ class OCRService(models.AbstractModel):
             extracted['date'] = date
         
         # Extract vendor/merchant name
-        vendor = self._extract_vendor_name(raw_text)
         if vendor:
             extracted['vendor'] = vendor
         
         # Extract description (first meaningful line)
-        description = self._extract_description(raw_text)
         if description:
             extracted['description'] = description
         
         return extracted
 
-    @api.model
-    def _extract_amounts(self, text):
-        """Extract monetary amounts from text"""
-        # Pattern for currency amounts
-        patterns = [
-            r'\$(\d+(?:,\d{3})*\.\d{2})',  # $123.45 or $1,234.56
-            r'(\d+(?:,\d{3})*\.\d{2})',   # 123.45 or 1,234.56
-            r'\$(\d+\.\d{2})',            # $123.45
-            r'(\d+\.\d{2})',              # 123.45
-        ]
-        
-        amounts = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                try:
-                    # Remove commas and convert to float
-                    amount = float(match.replace(',', ''))
-                    if 0.01 <= amount <= 100000:  # Reasonable range
-                        amounts.append(amount)
-                except ValueError:
-                    continue
-        
-        return amounts
-
     @api.model
     def _extract_date(self, text):
         """Extract date from text"""
-        # Common date patterns
-        patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{4})',  # MM/DD/YYYY or DD/MM/YYYY
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2})',  # MM/DD/YY or DD/MM/YY
-            r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',  # YYYY/MM/DD
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                try:
-                    # Try different date formats
-                    for fmt in ['%m/%d/%Y', '%d/%m/%Y', '%m-%d-%Y', '%d-%m-%Y', 
-                               '%Y/%m/%d', '%Y-%m-%d', '%m/%d/%y', '%d/%m/%y']:
-                        try:
-                            date_obj = datetime.strptime(match, fmt)
-                            # Adjust year for 2-digit years
-                            if date_obj.year < 1950:
-                                date_obj = date_obj.replace(year=date_obj.year + 100)
-                            return date_obj.date()
-                        except ValueError:
-                            continue
-                except Exception:
-                    continue
-        
-        return None
-
-    @api.model
-    def _extract_vendor_name(self, text):
-        """Extract vendor/merchant name from text"""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        if not lines:
-            return None
-        
-        # Usually the vendor name is in the first few lines
-        # Skip very short lines or lines with only numbers/symbols
-        for line in lines[:3]:
-            if (len(line) > 3 and 
-                not line.isdigit() and 
-                not re.match(r'^[\d\s.,/$:-]+$', line)):
-                return line
-        
-        return None
-
-    @api.model
-    def _extract_description(self, text):
-        """Extract description from text"""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        # Look for lines that might be item descriptions
-        for line in lines:
-            # Skip lines that are clearly amounts, dates, or vendor info
-            if (len(line) > 5 and 
-                not re.search(r'\$\d+\.\d{2}', line) and
-                not re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', line) and
-                not line.upper() in ['TOTAL', 'SUBTOTAL', 'TAX', 'RECEIPT']):
-                return line
+        for pattern, order in _DATE_DISPATCH:
+            for match in pattern.findall(text):
+                if order == 'ymd':
+                    year, month, day = map(int, match)
+                    candidates = [(month, day)]
+                else:
+                    first, second, year = map(int, match)
+                    if year < 100:
+                        year += 2000 if year <= 68 else 1900
+                    # Month first, then day first
+                    candidates = [(first, second), (second, first)]
+                
+                # Adjust year for 2-digit years
+                if year < 1950:
+                    year += 100
+                
+                for month, day in candidates:
+                    if 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]:
+                        return date(year, month, day)
         
         return None
 
@@ -444,16 +598,12 @@ class OCRService(models.AbstractModel):
             pass
         
         # Test Google Vision
-        try:
-            from google.cloud import vision
+        if vision is not None:
             results['google_vision_available'] = True
             
             # Check if configured
             api_key = self.env.company.google_vision_api_key or os.getenv('GOOGLE_VISION_API_KEY')
             results['google_vision_configured'] = bool(api_key)
-            
-        except ImportError:
-            pass
         
         return results
 
@@ -2,10 +2,20 @@
 
 import unittest
 import json
-import os
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
 from odoo.tests.common import TransactionCase
 from odoo.exceptions import UserError
+from odoo.addons.smart_expense_management.services import country_service as country_service_module
+
+
+def _fake_response(data):
+    """Minimal stand-in for a successful requests.Response"""
+    return SimpleNamespace(json=lambda: data, raise_for_status=lambda: None, status_code=200)
+
+
+def _raise(exc):
+    raise exc
 
 
 class TestCountryService(TransactionCase):
@@ -13,6 +23,13 @@ class TestCountryService(TransactionCase):
     def setUp(self):
         super().setUp()
         self.country_service = self.env['country.service']
+        # Parsed mappings are cached per process, start every test without them
+        country_service_module._COUNTRY_CACHE.clear()
+    
+    def tearDown(self):
+        # Fixture files are decoded once per process, keep tests isolated
+        country_service_module._load_fixture_json.cache_clear()
+        super().tearDown()
         
     def test_get_country_currency_success(self):
         """Test successful country currency lookup"""
@@ -26,6 +43,13 @@ class TestCountryService(TransactionCase):
             self.assertIsNotNone(result)
             self.assertEqual(result['code'], 'USD')
     
+    def test_get_country_currency_iso2_lookup(self):
+        """Test country currency lookup by ISO2 code on fixture mappings"""
+        with patch.object(country_service_module, '_USE_API_STUBS', True):
+            self.assertEqual(self.country_service.get_country_currency('IN')['code'], 'INR')
+            self.assertEqual(self.country_service.get_country_currency('gb')['code'], 'GBP')
+            self.assertEqual(self.country_service._get_iso2_index()['JP'], 'Japan')
+    
     def test_get_country_currency_not_found(self):
         """Test country currency lookup when country not found"""
         with patch.object(self.country_service, '_get_country_mappings') as mock_mappings:
@@ -47,13 +71,10 @@ class TestCountryService(TransactionCase):
             }
         ]
         
-        with patch('requests.get') as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = mock_response_data
-            mock_response.raise_for_status.return_value = None
-            mock_get.return_value = mock_response
+        with patch.object(country_service_module._HTTP, 'get') as mock_get:
+            mock_get.return_value = _fake_response(mock_response_data)
             
-            with patch.dict(os.environ, {'USE_API_STUBS': 'False'}):
+            with patch.object(country_service_module, '_USE_API_STUBS', False):
                 result = self.country_service._get_country_mappings(force_refresh=True)
                 
                 self.assertIn('United States', result)
@@ -62,7 +83,7 @@ class TestCountryService(TransactionCase):
     
     def test_get_country_mappings_api_failure_fallback(self):
         """Test fallback to fixtures when API fails"""
-        with patch('requests.get') as mock_get:
+        with patch.object(country_service_module._HTTP, 'get') as mock_get:
             mock_get.side_effect = Exception("API Error")
             
             with patch.object(self.country_service, '_load_fixture_countries') as mock_fixture:
@@ -77,7 +98,7 @@ class TestCountryService(TransactionCase):
     
     def test_get_country_mappings_with_stubs(self):
         """Test using API stubs"""
-        with patch.dict(os.environ, {'USE_API_STUBS': 'True'}):
+        with patch.object(country_service_module, '_USE_API_STUBS', True):
             with patch.object(self.country_service, '_load_fixture_countries') as mock_fixture:
                 mock_fixture.return_value = {
                     'Test Country': [{'code': 'TST', 'name': 'Test Currency', 'symbol': 'T'}]
@@ -105,6 +126,18 @@ class TestCountryService(TransactionCase):
                 self.assertIn('Test Country', result)
                 self.assertEqual(result['Test Country'][0]['code'], 'TST')
     
+    def test_load_fixture_countries_returns_fresh_mappings(self):
+        """Test that cached fixture data is not shared with callers"""
+        first = self.country_service._load_fixture_countries()
+        self.assertEqual(first['United States'][0]['code'], 'USD')
+        
+        first['United States'][0]['code'] = 'XXX'
+        del first['India']
+        
+        second = self.country_service._load_fixture_countries()
+        self.assertEqual(second['United States'][0]['code'], 'USD')
+        self.assertIn('India', second)
+    
     def test_parse_countries_data(self):
         """Test parsing of countries API response"""
         api_data = [
@@ -137,14 +170,16 @@ class TestCountryService(TransactionCase):
         currency_codes = [c['code'] for c in multi_currencies]
         self.assertIn('EUR', currency_codes)
         self.assertIn('USD', currency_codes)
+        
+        # Countries sharing a currency do not share its entry
+        us_currencies[0]['name'] = 'Changed'
+        multi_usd = next(c for c in multi_currencies if c['code'] == 'USD')
+        self.assertEqual(multi_usd['name'], 'US Dollar')
     
     def test_cache_behavior(self):
         """Test caching behavior"""
-        with patch('requests.get') as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.return_value = []
-            mock_response.raise_for_status.return_value = None
-            mock_get.return_value = mock_response
+        with patch.object(country_service_module._HTTP, 'get') as mock_get:
+            mock_get.return_value = _fake_response([])
             
             # First call should hit API
             self.country_service._get_country_mappings(force_refresh=True)
@@ -157,10 +192,12 @@ class TestCountryService(TransactionCase):
     def test_error_handling(self):
         """Test error handling in various scenarios"""
         # Test with malformed JSON response
-        with patch('requests.get') as mock_get:
-            mock_response = MagicMock()
-            mock_response.json.side_effect = json.JSONDecodeError("Invalid JSON", "", 0)
-            mock_get.return_value = mock_response
+        with patch.object(country_service_module._HTTP, 'get') as mock_get:
+            mock_get.return_value = SimpleNamespace(
+                json=lambda: _raise(json.JSONDecodeError("Invalid JSON", "", 0)),
+                raise_for_status=lambda: None,
+                status_code=200
+            )
             
             with patch.object(self.country_service, '_load_fixture_countries') as mock_fixture:
                 mock_fixture.return_value = {}
@@ -170,7 +207,7 @@ class TestCountryService(TransactionCase):
     
     def test_admin_notification_on_failure(self):
         """Test admin notification when API fails"""
-        with patch('requests.get') as mock_get:
+        with patch.object(country_service_module._HTTP, 'get') as mock_get:
             mock_get.side_effect = Exception("Network Error")
             
             with patch.object(self.env['mail.channel'], 'message_post') as mock_notify:
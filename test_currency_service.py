@@ -1,9 +1,11 @@
 # type: ignore
-import os
 import json
+import time
+from collections import deque
 from unittest.mock import patch, MagicMock
 from odoo.tests.common import TransactionCase
 from odoo.exceptions import UserError
+from odoo.addons.smart_expense_management.services import currency_service as currency_service_module
 
 
 class TestCurrencyService(TransactionCase):
@@ -14,27 +16,23 @@ class TestCurrencyService(TransactionCase):
         self.cache_model = self.env['currency.rate.cache']
         
         # Create test currencies
-        self.usd = self.env['res.currency'].create({
+        self.usd, self.eur, self.inr = self.env['res.currency'].create([{
             'name': 'USD',
             'symbol': '$',
             'position': 'before',
-        })
-        
-        self.eur = self.env['res.currency'].create({
+        }, {
             'name': 'EUR',
             'symbol': '€',
             'position': 'before',
-        })
-        
-        self.inr = self.env['res.currency'].create({
+        }, {
             'name': 'INR',
             'symbol': '₹',
             'position': 'before',
-        })
+        }])
 
     def test_get_exchange_rates_with_stubs(self):
         """Test getting exchange rates using API stubs"""
-        with patch.dict(os.environ, {'USE_API_STUBS': 'True'}):
+        with patch.object(currency_service_module, '_USE_API_STUBS', True):
             rates_data = self.currency_service.get_exchange_rates('USD')
             
             self.assertIsNotNone(rates_data)
@@ -45,7 +43,12 @@ class TestCurrencyService(TransactionCase):
 
     def test_currency_conversion_same_currency(self):
         """Test conversion between same currencies"""
-        result = self.currency_service.convert_amount(100.0, 'USD', 'USD')
+        with patch.object(currency_service_module._HTTP, 'get') as mock_get, \
+                patch.object(self.currency_service, 'get_exchange_rates') as mock_get_rates:
+            result = self.currency_service.convert_amount(100.0, 'USD', 'USD')
+            
+            mock_get.assert_not_called()
+            mock_get_rates.assert_not_called()
         
         self.assertEqual(result['converted_amount'], 100.0)
         self.assertEqual(result['exchange_rate'], 1.0)
@@ -53,7 +56,7 @@ class TestCurrencyService(TransactionCase):
 
     def test_currency_conversion_different_currencies(self):
         """Test conversion between different currencies"""
-        with patch.dict(os.environ, {'USE_API_STUBS': 'True'}):
+        with patch.object(currency_service_module, '_USE_API_STUBS', True):
             result = self.currency_service.convert_amount(100.0, 'USD', 'EUR')
             
             self.assertIsNotNone(result['converted_amount'])
@@ -61,6 +64,54 @@ class TestCurrencyService(TransactionCase):
             self.assertEqual(result['from_currency'], 'USD')
             self.assertEqual(result['to_currency'], 'EUR')
 
+    def test_currency_conversion_zero_amount(self):
+        """Test zero amounts convert without a rate lookup"""
+        with patch.object(self.currency_service, 'get_exchange_rates') as mock_get_rates:
+            result = self.currency_service.convert_amount(0.0, 'usd', 'EUR')
+            
+            mock_get_rates.assert_not_called()
+        
+        self.assertEqual(result['converted_amount'], 0.0)
+        self.assertEqual(result['source'], 'zero_amount')
+        self.assertEqual(result['from_currency'], 'USD')
+
+    def test_convert_amounts_bulk_mixed_currencies(self):
+        """Test bulk conversion looks up rates once per source currency"""
+        rates = {
+            'USD': {'rates': {'EUR': 0.85, 'INR': 84.15}, 'date': '2025-10-04', 'source': 'cache'},
+            'EUR': {'rates': {'USD': 1.18}, 'date': '2025-10-04', 'source': 'api'},
+        }
+        pairs = [
+            ('USD', 'EUR', None),
+            ('usd', 'INR', None),
+            ('EUR', 'USD', None),
+            ('USD', 'EUR', None),  # Duplicate pair
+            ('USD', 'GBP', None),  # No rate available
+        ]
+        
+        with patch.object(self.currency_service, 'get_exchange_rates') as mock_get_rates:
+            mock_get_rates.side_effect = lambda base, rate_date=None: rates[base]
+            results = self.currency_service.convert_amounts_bulk(pairs)
+            
+            self.assertEqual(mock_get_rates.call_count, 2)
+        
+        self.assertEqual(results[('USD', 'EUR', None)]['exchange_rate'], 0.85)
+        self.assertEqual(results[('usd', 'INR', None)]['exchange_rate'], 84.15)
+        self.assertEqual(results[('EUR', 'USD', None)]['exchange_rate'], 1.18)
+        self.assertEqual(results[('EUR', 'USD', None)]['source'], 'api')
+        self.assertNotIn(('USD', 'GBP', None), results)
+
+    def test_convert_amounts_bulk_same_currency(self):
+        """Test bulk conversion of same-currency pairs needs no rates"""
+        with patch.object(self.currency_service, 'get_exchange_rates') as mock_get_rates:
+            results = self.currency_service.convert_amounts_bulk([('USD', 'usd', None)])
+            
+            mock_get_rates.assert_not_called()
+        
+        result = results[('USD', 'usd', None)]
+        self.assertEqual(result['exchange_rate'], 1.0)
+        self.assertEqual(result['source'], 'no_conversion')
+
     def test_cache_storage_and_retrieval(self):
         """Test currency rate caching functionality"""
         # Store test rates
@@ -95,14 +146,16 @@ class TestCurrencyService(TransactionCase):
         })
         
         self.assertTrue(cache_entry.is_expired)
+        self.assertIn(cache_entry, self.cache_model.search([('is_expired', '=', True)]))
+        self.assertNotIn(cache_entry, self.cache_model.search([('is_expired', '=', False)]))
 
     def test_fallback_rates_when_api_fails(self):
         """Test fallback behavior when API is unavailable"""
-        with patch('requests.get') as mock_get:
+        with patch.object(currency_service_module._HTTP, 'get') as mock_get:
             # Mock API failure
             mock_get.side_effect = Exception("API unavailable")
             
-            with patch.dict(os.environ, {'USE_API_STUBS': 'False'}):
+            with patch.object(currency_service_module, '_USE_API_STUBS', False):
                 rates_data = self.currency_service.get_exchange_rates('USD')
                 
                 # Should get fallback rates
@@ -122,6 +175,15 @@ class TestCurrencyService(TransactionCase):
         self.assertIsNotNone(validated)
         self.assertEqual(validated['base'], 'USD')
         
+        # Unknown codes are dropped, allowlisted provider codes are kept
+        mixed_data = {
+            'base': 'USD',
+            'rates': {'EUR': 0.85, 'GGP': 0.73, 'ABC': 1.5, 'gbp': 0.73}
+        }
+        
+        validated = self.currency_service._validate_rates_response(mixed_data, 'USD')
+        self.assertEqual(set(validated['rates']), {'EUR', 'GGP', 'GBP'})
+        
         # Test invalid response
         invalid_data = {
             'base': 'USD',
@@ -135,14 +197,13 @@ class TestCurrencyService(TransactionCase):
     def test_cache_cleanup(self):
         """Test expired cache cleanup"""
         # Create some expired entries
-        for i in range(3):
-            self.cache_model.create({
-                'base_currency': f'TEST{i}',
-                'rate_date': '2020-01-01',
-                'rates_json': '{"EUR": 0.85}',
-                'ttl_hours': 1,
-                'fetched_at': '2020-01-01 00:00:00'
-            })
+        self.cache_model.create([{
+            'base_currency': f'TEST{i}',
+            'rate_date': '2020-01-01',
+            'rates_json': '{"EUR": 0.85}',
+            'ttl_hours': 1,
+            'fetched_at': '2020-01-01 00:00:00'
+        } for i in range(3)])
         
         # Run cleanup
         cleaned_count = self.currency_service.cleanup_expired_cache()
@@ -181,16 +242,19 @@ class TestCurrencyService(TransactionCase):
         self.assertTrue(allowed)
         
         # Test rate limit cache management
-        self.currency_service._rate_limit_cache['TEST'] = [1234567890] * 50  # Exceed limit
+        limit = self.currency_service._max_requests_per_minute
+        self.currency_service._rate_limit_cache['TEST'] = deque([time.monotonic()] * limit, maxlen=limit)  # Exceed limit
         limited = self.currency_service._check_rate_limit('TEST')
         self.assertFalse(limited)
 
     def tearDown(self):
         """Clean up after tests"""
         # Clean up test cache entries
-        test_entries = self.cache_model.search([
-            ('base_currency', 'in', ['USD', 'EUR', 'TEST', 'TEST0', 'TEST1', 'TEST2'])
-        ])
-        test_entries.unlink()
+        self.cache_model.flush_model()
+        self.env.cr.execute(
+            "DELETE FROM currency_rate_cache WHERE base_currency = ANY(%s)",
+            (['USD', 'EUR', 'TEST', 'TEST0', 'TEST1', 'TEST2'],)
+        )
+        self.cache_model.invalidate_model()
         
         super().tearDown()
@@ -0,0 +1,89 @@
+# type: ignore
+from odoo.tests.common import TransactionCase
+
+
+class TestExpenseClaim(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        employees = self.env['hr.employee'].create([
+            {'name': 'Claim Employee'},
+            {'name': 'First Approver'},
+            {'name': 'Second Approver'},
+        ])
+        self.employee, self.first_approver, self.second_approver = employees
+        self.rule = self.env['approval.rule'].create({'name': 'Test Rule'})
+
+        # in_review: first then second approver pending
+        # second_only: only the second approver pending
+        # draft: pending request but not in review
+        # no_pending: in review without a pending request
+        self.in_review, self.second_only, self.draft, self.no_pending = self.env['expense.claim'].create([
+            {'employee_id': self.employee.id} for _i in range(4)
+        ])
+        (self.in_review | self.second_only | self.no_pending).write({'state': 'submitted'})
+        self.claims = self.in_review | self.second_only | self.draft | self.no_pending
+
+        self.env['approval.request'].create([
+            self._request_vals(self.in_review, self.second_approver, 2),
+            self._request_vals(self.in_review, self.first_approver, 1),
+            self._request_vals(self.second_only, self.second_approver, 2),
+            self._request_vals(self.draft, self.first_approver, 1),
+            self._request_vals(self.no_pending, self.first_approver, 1, state='approved'),
+        ])
+
+    def _request_vals(self, claim, approver, sequence, state='pending'):
+        return {
+            'expense_claim_id': claim.id,
+            'approval_rule_id': self.rule.id,
+            'approver_id': approver.id,
+            'sequence': sequence,
+            'state': state,
+        }
+
+    def _search_claims(self, operator, value):
+        return self.env['expense.claim'].search([
+            ('id', 'in', self.claims.ids),
+            ('current_approver_id', operator, value),
+        ])
+
+    def test_current_approver_compute(self):
+        """Test the current approver is the lowest-sequence pending approver"""
+        self.assertEqual(self.in_review.current_approver_id, self.first_approver)
+        self.assertEqual(self.second_only.current_approver_id, self.second_approver)
+        self.assertFalse(self.draft.current_approver_id)
+        self.assertFalse(self.no_pending.current_approver_id)
+
+    def test_search_current_approver_equal(self):
+        """Test searching for a current approver skips later approvers in the chain"""
+        self.assertEqual(self._search_claims('=', self.first_approver.id), self.in_review)
+        self.assertEqual(self._search_claims('=', self.second_approver.id), self.second_only)
+        self.assertEqual(
+            self._search_claims('in', [self.first_approver.id, self.second_approver.id]),
+            self.in_review | self.second_only,
+        )
+
+    def test_search_current_approver_not_equal(self):
+        """Test excluding a current approver keeps claims without one"""
+        self.assertEqual(
+            self._search_claims('!=', self.first_approver.id),
+            self.second_only | self.draft | self.no_pending,
+        )
+        self.assertEqual(
+            self._search_claims('!=', self.second_approver.id),
+            self.in_review | self.draft | self.no_pending,
+        )
+
+    def test_search_current_approver_false(self):
+        """Test searching for claims with and without a current approver"""
+        self.assertEqual(self._search_claims('=', False), self.draft | self.no_pending)
+        self.assertEqual(self._search_claims('!=', False), self.in_review | self.second_only)
+
+    def test_create_logs_message_per_claim(self):
+        """Test each created claim gets its creation note"""
+        for claim in self.claims:
+            creation_notes = [
+                body for body in claim.message_ids.mapped('body')
+                if 'Expense claim created by Claim Employee' in body
+            ]
+            self.assertEqual(len(creation_notes), 1)
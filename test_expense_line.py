@@ -0,0 +1,123 @@
+# type: ignore
+from unittest.mock import patch
+from odoo.tests.common import TransactionCase
+from odoo.addons.smart_expense_management.models.expense_line import OCR_MAX_ATTEMPTS
+
+
+class TestExpenseLine(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = self.env['hr.employee'].create({'name': 'Test Employee'})
+        self.category = self.env['expense.category'].create({
+            'name': 'Test Meals',
+            'code': 'TESTMEALS',
+        })
+        self.claim = self.env['expense.claim'].create({
+            'employee_id': self.employee.id,
+        })
+
+    def _create_lines(self, count, **vals):
+        return self.env['expense.line'].create([dict({
+            'claim_id': self.claim.id,
+            'name': f'Line {i}',
+            'category_id': self.category.id,
+            'unit_amount': 10.0,
+        }, **vals) for i in range(count)])
+
+    def test_cron_failing_receipt_does_not_block_others(self):
+        """Test a receipt that keeps failing OCR stops blocking newer receipts"""
+        attachments = self.env['ir.attachment'].create([{
+            'name': f'receipt_{i}.png',
+            'raw': f'receipt {i}'.encode(),
+            'mimetype': 'image/png',
+        } for i in range(2)])
+        failing_line, other_line = self._create_lines(2)
+        failing_line.receipt_attachment_id = attachments[0]
+        other_line.receipt_attachment_id = attachments[1]
+
+        def process_receipts(receipts):
+            # The first receipt never yields a result
+            return {
+                attachment.id: {
+                    'success': True,
+                    'confidence': 0.9,
+                    'raw_text': 'TOTAL $10.00',
+                    'extracted_data': {},
+                }
+                for attachment in receipts if attachment != attachments[0]
+            }
+
+        # Keep other pending receipts (demo data) out of the cron batches
+        (self.env['expense.line'].search([('ocr_processed', '=', False)]) - failing_line - other_line).write({
+            'ocr_processed': True,
+        })
+
+        ocr_service_class = type(self.env['ocr.service'])
+        with patch.object(ocr_service_class, 'process_receipts', side_effect=process_receipts):
+            # Oldest lines come first, so the failing line is retried until it gives up
+            for attempt in range(1, OCR_MAX_ATTEMPTS + 1):
+                self.env['expense.line']._cron_process_pending_receipts(batch_size=1)
+                self.assertEqual(failing_line.ocr_attempts, attempt)
+                self.assertFalse(other_line.ocr_processed)
+
+            self.env['expense.line']._cron_process_pending_receipts(batch_size=1)
+
+        self.assertTrue(other_line.ocr_processed)
+        self.assertEqual(other_line.ocr_attempts, 0)
+        self.assertFalse(failing_line.ocr_processed)
+        self.assertEqual(failing_line.ocr_attempts, OCR_MAX_ATTEMPTS)
+
+    def test_prepare_move_lines(self):
+        """Test move line values for saved lines and lines being edited"""
+        vendor = self.env['res.partner'].create({'name': 'Test Vendor'})
+        lines = self._create_lines(2, vendor_id=vendor.id, reference='REF-1', quantity=2.0)
+
+        move_lines = lines._prepare_move_lines_bulk()
+
+        self.assertEqual(move_lines, [line._prepare_account_move_line() for line in lines])
+        self.assertEqual(move_lines[0]['name'], lines[0].name)
+        self.assertEqual(move_lines[0]['debit'], 20.0)
+        self.assertEqual(move_lines[0]['credit'], 0)
+        self.assertEqual(move_lines[0]['partner_id'], vendor.id)
+        self.assertEqual(move_lines[0]['ref'], 'REF-1')
+
+        # A record in an onchange has a NewId and isn't in the database
+        new_line = self.env['expense.line'].new({
+            'claim_id': self.claim.id,
+            'name': 'Unsaved line',
+            'category_id': self.category.id,
+            'unit_amount': 5.0,
+            'quantity': 3.0,
+        })
+        new_move_line = new_line._prepare_account_move_line()
+        self.assertEqual(new_move_line['name'], 'Unsaved line')
+        self.assertEqual(new_move_line['debit'], 15.0)
+
+        mixed_move_lines = (lines[0] | new_line)._prepare_move_lines_bulk()
+        self.assertEqual(mixed_move_lines, [move_lines[0], new_move_line])
+
+    def test_match_vendor_single_partner_query(self):
+        """Test vendor matching queries don't grow with the number of distinct names"""
+        vendor_names = ['Zyxwv', 'ZYXWV Trading', 'zyxwv trading company']
+        same_name_lines = self._create_lines(3, vendor_name='Zyxwv')
+        distinct_name_lines = self.env['expense.line'].create([{
+            'claim_id': self.claim.id,
+            'name': f'Line {vendor_name}',
+            'category_id': self.category.id,
+            'unit_amount': 10.0,
+            'vendor_name': vendor_name,
+        } for vendor_name in vendor_names])
+        partner = self.env['res.partner'].create({'name': 'Zyxwv Trading Company'})
+
+        def count_match_queries(lines):
+            self.env.flush_all()
+            lines.invalidate_recordset()
+            query_count = self.env.cr.sql_log_count
+            lines.action_match_vendor()
+            self.env.flush_all()
+            return self.env.cr.sql_log_count - query_count
+
+        self.assertEqual(count_match_queries(distinct_name_lines), count_match_queries(same_name_lines))
+        self.assertEqual(same_name_lines.vendor_id, partner)
+        self.assertEqual(distinct_name_lines.vendor_id, partner)
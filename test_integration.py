@@ -5,11 +5,21 @@ import json
 import requests
 from odoo.tests.common import HttpCase, TransactionCase
 from odoo.exceptions import ValidationError
+from odoo.addons.smart_expense_management.services import currency_service as currency_service_module
 
 
 class TestIntegration(HttpCase):
     """Integration tests for the Smart Expense Management module"""
     
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        
+        # System records, resolved once per class
+        cls.usd_ref = cls.env.ref('base.USD')
+        cls.eur_ref = cls.env.ref('base.EUR')
+        cls.group_user = cls.env.ref('base.group_user')
+    
     def setUp(self):
         super().setUp()
         
@@ -18,14 +28,14 @@ class TestIntegration(HttpCase):
             'name': 'Test Employee',
             'login': 'employee@test.com',
             'email': 'employee@test.com',
-            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])]
+            'groups_id': [(6, 0, [self.group_user.id])]
         })
         
         self.manager_user = self.env['res.users'].create({
             'name': 'Test Manager',
             'login': 'manager@test.com',
             'email': 'manager@test.com',
-            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])]
+            'groups_id': [(6, 0, [self.group_user.id])]
         })
         
         # Create test employees
@@ -45,7 +55,7 @@ class TestIntegration(HttpCase):
         # Create test company with currency
         self.test_company = self.env['res.company'].create({
             'name': 'Test Company',
-            'currency_id': self.env.ref('base.USD').id,
+            'currency_id': self.usd_ref.id,
         })
         
         # Create approval rule
@@ -53,7 +63,7 @@ class TestIntegration(HttpCase):
             'name': 'Manager Approval',
             'rule_type': 'manager',
             'amount_threshold': 100.0,
-            'currency_id': self.env.ref('base.USD').id,
+            'currency_id': self.usd_ref.id,
             'sequence': 1,
             'company_id': self.test_company.id,
         })
@@ -73,7 +83,7 @@ class TestIntegration(HttpCase):
             'expense_claim_id': expense_claim.id,
             'description': 'Restaurant bill',
             'amount': 150.0,
-            'currency_id': self.env.ref('base.USD').id,
+            'currency_id': self.usd_ref.id,
             'expense_date': '2024-01-15',
         })
         
@@ -111,7 +121,7 @@ class TestIntegration(HttpCase):
             'expense_claim_id': expense_claim.id,
             'description': 'Hotel in Paris',
             'amount': 200.0,
-            'currency_id': self.env.ref('base.EUR').id,
+            'currency_id': self.eur_ref.id,
             'expense_date': '2024-01-15',
         })
         
@@ -175,7 +185,7 @@ class TestIntegration(HttpCase):
             'expense_claim_id': high_amount_claim.id,
             'description': 'Expensive equipment',
             'amount': 5000.0,
-            'currency_id': self.env.ref('base.USD').id,
+            'currency_id': self.usd_ref.id,
             'expense_date': '2024-01-15',
         })
         
@@ -184,7 +194,7 @@ class TestIntegration(HttpCase):
             'name': 'CFO Approval',
             'rule_type': 'amount',
             'amount_threshold': 1000.0,
-            'currency_id': self.env.ref('base.USD').id,
+            'currency_id': self.usd_ref.id,
             'sequence': 2,
             'company_id': self.test_company.id,
             'approver_ids': [(6, 0, [self.manager.id])]  # Using manager as CFO for test
@@ -232,7 +242,7 @@ class TestIntegration(HttpCase):
         currency_service = self.env['currency.service']
         
         # Test with API stubs enabled
-        with unittest.mock.patch.dict('os.environ', {'USE_API_STUBS': 'True'}):
+        with unittest.mock.patch.object(currency_service_module, '_USE_API_STUBS', True):
             rates = currency_service.get_exchange_rates('USD')
             
             self.assertIsNotNone(rates)
@@ -264,7 +274,7 @@ class TestIntegration(HttpCase):
         """Test error handling and admin notifications"""
         
         # Test with network error simulation
-        with unittest.mock.patch('requests.get') as mock_get:
+        with unittest.mock.patch.object(currency_service_module._HTTP, 'get') as mock_get:
             mock_get.side_effect = requests.exceptions.ConnectionError("Network error")
             
             currency_service = self.env['currency.service']
@@ -313,32 +323,27 @@ class TestIntegration(HttpCase):
     def test_performance_with_large_dataset(self):
         """Test performance with larger dataset"""
         
-        # Create multiple expenses
-        expenses = []
-        for i in range(10):
-            expense = self.env['expense.claim'].create({
-                'employee_id': self.employee.id,
-                'description': f'Performance test expense {i}',
-                'company_id': self.test_company.id,
-            })
-            
-            self.env['expense.line'].create({
-                'expense_claim_id': expense.id,
-                'description': f'Line {i}',
-                'amount': 100.0 + i,
-                'currency_id': self.env.ref('base.USD').id,
-                'expense_date': '2024-01-15',
-            })
-            
-            expenses.append(expense)
+        # Create multiple expenses, one batched create per model
+        expenses = self.env['expense.claim'].create([{
+            'employee_id': self.employee.id,
+            'description': f'Performance test expense {i}',
+            'company_id': self.test_company.id,
+        } for i in range(10)])
+        
+        self.env['expense.line'].create([{
+            'expense_claim_id': expense.id,
+            'description': f'Line {i}',
+            'amount': 100.0 + i,
+            'currency_id': self.usd_ref.id,
+            'expense_date': '2024-01-15',
+        } for i, expense in enumerate(expenses)])
         
-        # Submit all expenses
-        for expense in expenses:
-            expense.action_submit()
+        # Submit all expenses in one batch
+        expenses.action_submit()
         
         # Check all approval requests were created efficiently
         all_requests = self.env['approval.request'].search([
-            ('expense_claim_id', 'in', [e.id for e in expenses])
+            ('expense_claim_id', 'in', expenses.ids)
         ])
         
         self.assertEqual(len(all_requests), len(expenses))
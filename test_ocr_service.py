@@ -0,0 +1,155 @@
+# type: ignore
+from datetime import date
+from unittest.mock import patch
+from odoo.tests.common import TransactionCase
+
+
+class TestOCRService(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ocr_service = self.env['ocr.service']
+
+    def test_extract_structured_data(self):
+        """Test amount, vendor and date extraction from receipt text"""
+        raw_text = (
+            "COFFEE HOUSE\n"
+            "123 Main St\n"
+            "10/04/2025\n"
+            "Latte 4.50\n"
+            "Catering $1,195.00\n"
+            "TOTAL $1,199.50\n"
+        )
+
+        extracted = self.ocr_service._extract_structured_data(raw_text)
+
+        self.assertEqual(extracted['amount'], 1199.50)
+        self.assertEqual(extracted['vendor'], 'COFFEE HOUSE')
+        self.assertEqual(extracted['date'], date(2025, 10, 4))
+
+    def test_extract_structured_data_skips_numeric_vendor_lines(self):
+        """Test vendor extraction ignores leading number-only lines"""
+        raw_text = "12/03/2024\n0042\nCity Taxi Co\nFare 18.40\n"
+
+        extracted = self.ocr_service._extract_structured_data(raw_text)
+
+        self.assertEqual(extracted['vendor'], 'City Taxi Co')
+        self.assertEqual(extracted['amount'], 18.40)
+
+    def test_extract_structured_data_empty_text(self):
+        """Test extraction from empty OCR text"""
+        self.assertEqual(self.ocr_service._extract_structured_data(''), {})
+        self.assertEqual(self.ocr_service._extract_structured_data('\n  \n'), {})
+
+    def test_extract_date_formats(self):
+        """Test date extraction for the supported formats"""
+        extract_date = self.ocr_service._extract_date
+
+        self.assertEqual(extract_date('Date: 10/04/2025'), date(2025, 10, 4))
+        self.assertEqual(extract_date('Date: 25/12/2024'), date(2024, 12, 25))  # Day first
+        self.assertEqual(extract_date('Date: 10-04-25'), date(2025, 10, 4))
+        self.assertEqual(extract_date('Date: 2025-10-04'), date(2025, 10, 4))
+        self.assertEqual(extract_date('Date: 29/02/2024'), date(2024, 2, 29))  # Leap year
+
+    def test_extract_date_invalid_dates(self):
+        """Test impossible calendar dates are not extracted"""
+        extract_date = self.ocr_service._extract_date
+
+        self.assertIsNone(extract_date('Date: 31/02/2025'))
+        self.assertIsNone(extract_date('Date: 29/02/2025'))
+        self.assertIsNone(extract_date('Date: 2025-13-01'))
+        self.assertIsNone(extract_date('No date here'))
+
+        # An invalid date doesn't hide a later valid one
+        self.assertEqual(extract_date('31/02/2025 then 03/01/2025'), date(2025, 3, 1))
+
+        extracted = self.ocr_service._extract_structured_data("SHOP NAME\n31/02/2025\nTOTAL 9.99")
+        self.assertNotIn('date', extracted)
+
+    def test_estimate_confidence_unicode_whitespace(self):
+        """Test Unicode spaces from OCR aren't penalized as special characters"""
+        ascii_text = 'COFFEE HOUSE\nTOTAL $12.50\t10/04/2025'
+        unicode_text = 'COFFEE\u00a0HOUSE\u2028TOTAL\u2009$12.50\u300010/04/2025'
+
+        self.assertEqual(
+            self.ocr_service._estimate_confidence(unicode_text),
+            self.ocr_service._estimate_confidence(ascii_text),
+        )
+
+    def _create_receipt(self, name, raw=b'receipt image bytes'):
+        return self.env['ir.attachment'].create({
+            'name': name,
+            'raw': raw,
+            'mimetype': 'image/png',
+        })
+
+    def test_process_receipts_cache_hit(self):
+        """Test a cached receipt is returned without running OCR"""
+        attachment = self._create_receipt('receipt.png')
+        self.env['ocr.cache'].create({
+            'checksum': attachment.checksum,
+            'raw_text': 'COFFEE HOUSE\nTOTAL $12.50',
+            'extracted_data_json': '{"amount": 12.5, "date": "2025-10-04"}',
+            'confidence': 0.9,
+            'source': 'tesseract',
+        })
+
+        with patch.object(self.ocr_service, '_process_with_tesseract') as mock_tesseract, \
+                patch.object(self.ocr_service, '_process_batch_with_google_vision') as mock_vision:
+            results = self.ocr_service.process_receipts(attachment)
+
+            mock_tesseract.assert_not_called()
+            mock_vision.assert_not_called()
+
+        result = results[attachment.id]
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['source'], 'tesseract')
+        self.assertEqual(result['extracted_data']['amount'], 12.5)
+        self.assertEqual(result['extracted_data']['date'], date(2025, 10, 4))
+
+    def test_store_results_duplicate_checksum(self):
+        """Test receipts sharing a checksum are cached once"""
+        ocr_cache = self.env['ocr.cache']
+        attachments = self._create_receipt('receipt.png') | self._create_receipt('receipt copy.png')
+        self.assertEqual(attachments[0].checksum, attachments[1].checksum)
+
+        results = {
+            attachment.id: {
+                'success': True,
+                'confidence': 0.8,
+                'raw_text': 'TOTAL $12.50',
+                'extracted_data': {'amount': 12.5},
+                'source': 'tesseract',
+            }
+            for attachment in attachments
+        }
+
+        created = ocr_cache.store_results(attachments, results)
+        self.assertEqual(len(created), 1)
+
+        # Storing again finds the existing entry instead of failing on the constraint
+        self.assertFalse(ocr_cache.store_results(attachments, results))
+        self.assertEqual(ocr_cache.search_count([('checksum', '=', attachments[0].checksum)]), 1)
+
+    def test_cache_is_per_company(self):
+        """Test cached results filtered for one company aren't served to another"""
+        ocr_cache = self.env['ocr.cache']
+        attachment = self._create_receipt('receipt.png')
+        other_company = self.env['res.company'].create({'name': 'Other OCR Company'})
+        results = {
+            attachment.id: {
+                'success': True,
+                'confidence': 0.8,
+                'raw_text': 'TOTAL $12.50',
+                'extracted_data': {'amount': 12.5},
+                'source': 'tesseract',
+            }
+        }
+
+        self.assertEqual(ocr_cache.store_results(attachment, results).company_id, self.env.company)
+        self.assertFalse(ocr_cache.with_company(other_company).get_cached_results(attachment))
+
+        # The other company gets its own entry for the same receipt file
+        other_entry = ocr_cache.with_company(other_company).store_results(attachment, results)
+        self.assertEqual(other_entry.company_id, other_company)
+        self.assertIn(attachment.id, ocr_cache.with_company(other_company).get_cached_results(attachment))